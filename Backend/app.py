@@ -426,6 +426,55 @@ def overview(
     return result
 
 
+# -------------------------------------------------
+# /status JSON API (corpus generation: changes whenever the ingest commits documents)
+# -------------------------------------------------
+@app.get("/status")
+def status():
+    conn = database_manager.db(config.DB_PATH_MAIN)
+    try:
+        generation = database_manager.corpus_generation(conn)
+        n_docs = conn.execute("SELECT COUNT(*) FROM document").fetchone()[0]
+    finally:
+        conn.close()
+    return {"corpus_generation": generation, "documents": n_docs}
+
+
+# -------------------------------------------------
+# /document/{id}/tree JSON API (viewer: outline, then one section at a time;
+# full=1 returns the whole nested tree, e.g. for export)
+# -------------------------------------------------
+@app.get("/document/{document_id}/tree")
+def document_tree_outline(document_id: int, full: bool = Query(False)):
+    conn = database_manager.db(config.DB_PATH_MAIN)
+    try:
+        if full:
+            tree = database_manager.fetch_document_tree(conn, document_id)
+        else:
+            outline = database_manager.fetch_tree_outline(conn, document_id)
+    finally:
+        conn.close()
+    if full:
+        if tree is None:
+            raise HTTPException(status_code=404, detail="No tree stored for this document")
+        return {"document_id": document_id, "tree": tree}
+    if not outline:
+        raise HTTPException(status_code=404, detail="No tree stored for this document")
+    return {"document_id": document_id, "sections": outline}
+
+
+@app.get("/document/{document_id}/tree/{section}")
+def document_tree_section(document_id: int, section: int):
+    conn = database_manager.db(config.DB_PATH_MAIN)
+    try:
+        node = database_manager.fetch_tree_section(conn, document_id, section)
+    finally:
+        conn.close()
+    if node is None:
+        raise HTTPException(status_code=404, detail="Section not found")
+    return node
+
+
 # -------------------------------------------------
 # LOCAL DEV ENTRYPOINT
 # -------------------------------------------------
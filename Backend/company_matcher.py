@@ -0,0 +1,90 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Same word boundary as config.WORD_BOUNDARY: a hit may not touch [A-Za-z0-9]
+# (case-insensitive, exactly as the old per-pattern re.findall(..., re.I) did).
+_WORD_CHAR = re.compile(r"[A-Za-z0-9]", re.I)
+_TERM = ""  # trie key marking "a surface form ends here" (never a real char)
+
+KINDS = ("name_hits", "ticker_hits", "alias_hits")
+
+
+def compile_matcher(
+    specs: Iterable[Tuple[Any, Optional[str], Optional[str], Sequence[str]]],
+) -> Dict[str, Any]:
+    """
+    Compile every company's surface forms into one matcher.
+
+    specs: (key, name, ticker, aliases) per company; key is whatever the caller
+    wants back (company_id, ticker, ...). Forms are lower-cased; empty ones are
+    dropped. A form listed twice (or shared by two companies) is counted once
+    per listing, like the old one-regex-per-form loops.
+
+    Returns a dict with:
+      - "forms": {form: [(key, kind), ...]}
+      - "trie":  nested dict of form characters
+      - "starts": one regex finding every boundary position where some form begins
+    """
+    forms: Dict[str, List[Tuple[Any, str]]] = {}
+    for key, name, ticker, aliases in specs:
+        for kind, terms in (("name_hits", [name]), ("ticker_hits", [ticker]), ("alias_hits", aliases or [])):
+            for t in terms:
+                t = (t or "").strip().lower()
+                if t:
+                    forms.setdefault(t, []).append((key, kind))
+
+    trie: Dict[str, Any] = {}
+    for form in forms:
+        node = trie
+        for ch in form:
+            node = node.setdefault(ch, {})
+        node[_TERM] = form
+
+    starts = None
+    if forms:
+        alternation = "|".join(re.escape(f) for f in sorted(forms, key=len, reverse=True))
+        starts = re.compile(rf"(?<![A-Za-z0-9])(?=(?:{alternation}))", re.I)
+
+    return {"forms": forms, "trie": trie, "starts": starts}
+
+
+def count_hits(matcher: Dict[str, Any], low_text: str) -> Dict[Any, Dict[str, int]]:
+    """
+    Count name/ticker/alias hits for every company in ONE pass over lower-cased text.
+
+    The regex only finds candidate start positions; the trie then reports every
+    form matching there (so "jb hi-fi limited", "jb hi-fi" and "jb" all count,
+    as they did with separate patterns). Per form, hits never overlap, matching
+    re.findall.
+
+    Returns {key: {"name_hits", "ticker_hits", "alias_hits", "total_hits"}} for
+    companies with at least one hit.
+    """
+    out: Dict[Any, Dict[str, int]] = {}
+    if not low_text or matcher["starts"] is None:
+        return out
+
+    forms, trie = matcher["forms"], matcher["trie"]
+    n = len(low_text)
+    last_end: Dict[str, int] = {}
+
+    for m in matcher["starts"].finditer(low_text):
+        i = m.start()
+        node, j = trie, i
+        while node is not None:
+            form = node.get(_TERM)
+            if form is not None and i >= last_end.get(form, 0) and (j >= n or not _WORD_CHAR.match(low_text, j)):
+                last_end[form] = j
+                for key, kind in forms[form]:
+                    row = out.get(key)
+                    if row is None:
+                        row = out[key] = {"name_hits": 0, "ticker_hits": 0, "alias_hits": 0, "total_hits": 0}
+                    row[kind] += 1
+                    row["total_hits"] += 1
+            if j >= n:
+                break
+            node = node.get(low_text[j])
+            j += 1
+
+    return out
@@ -94,6 +94,11 @@ REWRITE_PPAR   = 3
 
 OVERVIEW_TOP_K = 16 # unused 
 
+CENTROID_RANK = True  # use case 1: re-rank the head of the doc pool by query · document centroid embedding
+CENTROID_RERANK_TOP_N = 30  # only the first N docs of the mention-count order are re-ranked
+
+PERSIST_DYNAMIC_COMPANIES = True  # write LLM-discovered (off-book) companies + their hit counts into the company index
+
 _CIT_MARK = re.compile(r'\[S(?P<S>\d+)\s+p(?P<page>\d+)\s+"(?P<quote>[^"]+)"\]')
 DATE_RE = re.compile(r"(\d{6})")  # matches yymmdd
 
@@ -1,15 +1,145 @@
 import re 
 import json
+import zlib
 import sqlite3 
-from typing import Dict, List, Tuple, Optional, Sequence, Any
+import datetime
+import threading
+import numpy as np
+import company_matcher
+import term_index
+from typing import Dict, List, Tuple, Optional, Sequence, Iterable, Any
 
 
+# chunk.text / document.meta may be stored compressed (ingest_dir --compress):
+# a BLOB of TEXT_CODEC_ZLIB + zlib(utf-8). Plain TEXT values are stored as-is.
+TEXT_CODEC_ZLIB = b"Z"
+
+def encode_text(text: Optional[str], compress: bool = True) -> Any:
+    """Compress text for storage; keeps plain text when zlib would not make it smaller."""
+    if text is None or not compress:
+        return text
+    raw = text.encode("utf-8")
+    packed = TEXT_CODEC_ZLIB + zlib.compress(raw, 6)
+    return packed if len(packed) < len(raw) else text
+
+def decode_text(value: Any) -> Optional[str]:
+    """Inverse of encode_text; also safe on plain TEXT values."""
+    if value is None or isinstance(value, str):
+        return value
+    b = bytes(value)
+    if b[:1] == TEXT_CODEC_ZLIB:
+        return zlib.decompress(b[1:]).decode("utf-8")
+    return b.decode("utf-8", errors="replace")
+
+def register_codec(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Expose decode_text() to SQL, e.g. json_extract(decode_text(meta), '$.x')."""
+    conn.create_function("decode_text", 1, decode_text, deterministic=True)
+    return conn
+
+def reencode_stored_text(conn: sqlite3.Connection, compress: bool = True, batch: int = 5000):
+    """Re-encode chunk.text and document.meta in place (compress=False restores plain TEXT)."""
+    for table, key, col in (("chunk", "chunk_id", "text"), ("document", "document_id", "meta")):
+        last_id, changed = 0, 0
+        while True:
+            rows = conn.execute(
+                f"SELECT {key} AS k, {col} AS v FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?",
+                (last_id, batch),
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = []
+            for k, v in rows:
+                new_v = encode_text(decode_text(v), compress)
+                if new_v != v:
+                    updates.append((new_v, k))
+            conn.executemany(f"UPDATE {table} SET {col}=? WHERE {key}=?", updates)
+            conn.commit()
+            changed += len(updates)
+        print(f"reencode_stored_text: {table}.{col} re-encoded {changed} rows (compress={compress})")
+
+def corpus_generation(conn: sqlite3.Connection) -> int:
+    """Counter ingest_dir bumps with every committed document change (0 if never ingested with it)."""
+    try:
+        row = conn.execute("SELECT generation FROM corpus_generation WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return int(row[0]) if row else 0
+
+# ---- document trees (document_tree_section, written by ingest_dir) ----
+# One row per section of the DOCX tree; row 0 is the document root. Each row
+# holds only that section's own blocks as compact JSON (encode_text codec);
+# nested sections appear as {"type": "section_ref", "section": n}, so a
+# viewer can read the outline and then one section at a time.
+
+def tree_section_rows(tree: Dict[str, Any], compress: bool = True) -> List[Tuple[int, Optional[int], int, Optional[str], Any]]:
+    """Split a build_tree-style tree into (section, parent, level, title, data) rows."""
+    rows: List[Any] = []
+
+    def walk(node: Dict[str, Any], parent: Optional[int]) -> int:
+        idx = len(rows)
+        rows.append(None)
+        blocks = []
+        for child in node.get("children", []):
+            if child.get("type") == "section":
+                blocks.append({"type": "section_ref", "section": walk(child, idx)})
+            else:
+                blocks.append(child)
+        data = json.dumps(blocks, ensure_ascii=False, separators=(",", ":"))
+        rows[idx] = (idx, parent, int(node.get("level") or 0), node.get("title"), encode_text(data, compress))
+        return idx
+
+    walk(tree, None)
+    return rows
+
+def fetch_tree_outline(conn: sqlite3.Connection, document_id: int) -> List[Dict[str, Any]]:
+    """[{section, parent, level, title}, ...] in document order; no block data is read."""
+    rows = conn.execute(
+        "SELECT section, parent, level, title FROM document_tree_section WHERE document_id=? ORDER BY section",
+        (int(document_id),),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+def fetch_tree_section(conn: sqlite3.Connection, document_id: int, section: int) -> Optional[Dict[str, Any]]:
+    """One section with its own blocks; nested sections stay as section_ref entries."""
+    r = conn.execute(
+        "SELECT section, parent, level, title, data FROM document_tree_section WHERE document_id=? AND section=?",
+        (int(document_id), int(section)),
+    ).fetchone()
+    if r is None:
+        return None
+    node: Dict[str, Any] = {"type": "section" if r["section"] else "document", "section": r["section"], "parent": r["parent"]}
+    if r["section"]:
+        node["title"], node["level"] = r["title"], r["level"]
+    node["children"] = json.loads(decode_text(r["data"]) or "[]")
+    return node
+
+def fetch_document_tree(conn: sqlite3.Connection, document_id: int) -> Optional[Dict[str, Any]]:
+    """The whole tree, reassembled exactly as build_tree returned it."""
+    rows = conn.execute(
+        "SELECT section, level, title, data FROM document_tree_section WHERE document_id=? ORDER BY section",
+        (int(document_id),),
+    ).fetchall()
+    if not rows:
+        return None
+    by_idx = {r["section"]: r for r in rows}
+
+    def build(idx: int) -> Dict[str, Any]:
+        r = by_idx[idx]
+        children = [build(b["section"]) if b.get("type") == "section_ref" else b
+                    for b in json.loads(decode_text(r["data"]) or "[]")]
+        if idx == 0:
+            return {"type": "document", "children": children}
+        return {"type": "section", "title": r["title"], "level": r["level"], "children": children}
+
+    return build(0)
 
 def db(db_path_main) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path_main, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys=ON;")
     conn.execute("PRAGMA journal_mode=WAL;")
+    register_codec(conn)
     return conn
 
 def rows_to_dicts(rows: List[sqlite3.Row]) -> List[Dict[str, Any]]:
@@ -48,6 +178,16 @@ def safe_regex_count(pattern: Optional[str], text: str) -> int:
     except re.error:
         return 0
     
+def _published_date_select(conn: sqlite3.Connection, alias: str = "") -> str:
+    """
+    SELECT expression for document.published_date (normalised YYYY-MM-DD set at
+    ingest); NULL on DBs that predate the column.
+    """
+    prefix = f"{alias}." if alias else ""
+    if _col_exists(conn, "document", "published_date"):
+        return f"{prefix}published_date AS published_date"
+    return "NULL AS published_date"
+
 def resolve_company_ids(
     conn: sqlite3.Connection,
     cues: List[str],
@@ -86,6 +226,7 @@ def fetch_doc_pool(
 
     have_alias = _col_exists(conn, "company_term_count", "alias_hits")
     extra = ", c.alias_hits" if have_alias else ""
+    pub_date = _published_date_select(conn, "d")
 
     qmarks = ",".join("?" * len(company_ids))
 
@@ -94,6 +235,7 @@ def fetch_doc_pool(
             d.document_id,
             d.title,
             d.published_at,
+            {pub_date},
             '' AS source_url,
             '' AS source_path,
             c.company_id,
@@ -137,12 +279,14 @@ def fetch_all_docs(
 
     have_alias = _col_exists(conn, "company_term_count", "alias_hits")
     extra = ", c.alias_hits" if have_alias else ""
+    pub_date = _published_date_select(conn, "d")
 
     sql = f"""
         SELECT 
             d.document_id,
             d.title,
             d.published_at,
+            {pub_date},
             '' AS source_url,
             '' AS source_path,
             c.company_id,
@@ -165,66 +309,138 @@ def fetch_all_docs(
     cur.close()
     return rows
 
+# (table, text_col, page_col, idx_col) layouts seen in past DBs, in preference order
+CHUNK_LAYOUT_CANDIDATES: List[Tuple[str, str, str, str]] = [
+    ("chunk", "text", "page_start", "chunk_index"),
+    ("chunk", "chunk_text", "page_start", "chunk_index"),
+    ("chunk", "content", "page_no", "chunk_id"),
+    ("chunks", "content", "page_no", "chunk_id"),
+    ("doc_chunk", "content", "page_no", "chunk_idx"),
+    ("main_chunk", "content", "page_no", "chunk_id"),
+]
+
+# (db file, schema_version) -> matching layouts with their compiled SQL
+_CHUNK_LAYOUT_CACHE: Dict[Tuple[str, int], List[Dict[str, str]]] = {}
+
+def _db_file(conn: sqlite3.Connection) -> str:
+    """Path of the connection's main database ('' for in-memory DBs)."""
+    for r in conn.execute("PRAGMA database_list").fetchall():
+        if r[1] == "main":
+            return r[2] or ""
+    return ""
+
+def resolve_chunk_layouts(conn: sqlite3.Connection) -> List[Dict[str, str]]:
+    """
+    Detect which chunk table/column layouts exist, once per DB file and
+    schema version, and compile one bulk SELECT per layout.
+
+    The document ids are bound as a single JSON array (json_each), so each
+    layout is one fixed SQL string that sqlite3 keeps prepared in its
+    statement cache, whatever the number of ids.
+    """
+    db_file = _db_file(conn)
+    schema_version = int(conn.execute("PRAGMA schema_version").fetchone()[0])
+    key = (db_file or f":memory:{id(conn)}", schema_version)
+    cached = _CHUNK_LAYOUT_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    cols_by_table: Dict[str, set] = {}
+    layouts: List[Dict[str, str]] = []
+    for table, text_c, page_c, idx_c in CHUNK_LAYOUT_CANDIDATES:
+        if table not in cols_by_table:
+            try:
+                cols_by_table[table] = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+            except Exception:
+                cols_by_table[table] = set()
+        cols = cols_by_table[table]
+        if not ({"document_id", text_c, page_c} <= cols):
+            continue
+        has_idx = idx_c in cols
+        sql = f"""
+            SELECT
+              document_id,
+              COALESCE({page_c}, 1) AS page,
+              {text_c} AS text,
+              {'COALESCE(' + idx_c + ', 0)' if has_idx else '0'} AS chunk_index
+            FROM {table}
+            WHERE document_id IN (SELECT value FROM json_each(?))
+            ORDER BY document_id, COALESCE({page_c}, 999999), {idx_c if has_idx else 'rowid'}
+        """
+        layouts.append({"table": table, "text": text_c, "page": page_c, "idx": idx_c, "sql": sql})
+
+    print(
+        "resolve_chunk_layouts: "
+        f"{[(l['table'], l['text'], l['page'], l['idx']) for l in layouts] or 'no layouts matched'}"
+    )
+    _CHUNK_LAYOUT_CACHE[key] = layouts
+    return layouts
+
+def fetch_chunks_for_documents(
+    conn: sqlite3.Connection,
+    document_ids: Sequence[int],
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Bulk version of fetch_doc_chunks_robust.
+
+    Returns {document_id: [{page, chunk_index, text}, ...]} for every id asked
+    for ([] when nothing matched). As before, a document falls through to the
+    next layout only when the preferred layout gives it no non-empty text.
+    """
+    out: Dict[int, List[Dict[str, Any]]] = {int(d): [] for d in document_ids}
+    remaining = set(out)
+    for layout in resolve_chunk_layouts(conn):
+        if not remaining:
+            break
+        try:
+            cur = conn.execute(layout["sql"], (json.dumps(sorted(remaining)),))
+            rows = cur.fetchall()
+            cur.close()
+        except Exception as e:
+            print(
+                f"fetch_chunks_for_documents: failed on {layout['table']} "
+                f"({layout['text']},{layout['page']},{layout['idx']}): {e}"
+            )
+            continue
+        found: Dict[int, List[Dict[str, Any]]] = {}
+        for r in rows:
+            t = (decode_text(r["text"]) or "").strip()
+            if not t:
+                continue
+            found.setdefault(int(r["document_id"]), []).append(
+                {"page": int(r["page"] or 1), "chunk_index": int(r["chunk_index"] or 0), "text": t}
+            )
+        out.update(found)
+        remaining -= set(found)
+    return out
+
+def iter_chunks_for_documents(
+    conn: sqlite3.Connection,
+    document_ids: Sequence[int],
+    batch_size: int = 200,
+):
+    """
+    Yield (document_id, chunks) in the given order, fetching `batch_size`
+    documents per query so a corpus-wide scan never holds all text at once.
+    """
+    for part in _id_batches(document_ids, batch_size):
+        by_doc = fetch_chunks_for_documents(conn, part)
+        for did in part:
+            yield int(did), by_doc.get(int(did), [])
+
 def fetch_doc_chunks_robust(
     conn: sqlite3.Connection,
     document_id: int,
 ) -> List[Dict[str, Any]]:
     """
     Return rows with unified keys: page:int, chunk_index:int, text:str
-    Tries multiple table/column layouts seen in your DBs.
-    """
-    candidates = [
-        # (table,         text_col,        page_col,         idx_col)
-        ("chunk", "text", "page_start", "chunk_index"),
-        ("chunk", "chunk_text", "page_start", "chunk_index"),
-        ("chunk", "content", "page_no", "chunk_id"),
-        ("chunks", "content", "page_no", "chunk_id"),
-        ("doc_chunk", "content", "page_no", "chunk_idx"),
-        ("main_chunk", "content", "page_no", "chunk_id"),
-    ]
-    for table, text_c, page_c, idx_c in candidates:
-        try:
-            cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
-        except Exception:
-            continue
-        if {text_c}.issubset(cols) and page_c in cols:
-            has_idx = idx_c in cols
-            try:
-                sql = f"""
-                    SELECT
-                      COALESCE({page_c}, 1) AS page,
-                      {text_c} AS text
-                      {', COALESCE(' + idx_c + ', 0) AS chunk_index' if has_idx else ', 0 AS chunk_index'}
-                    FROM {table}
-                    WHERE document_id = ?
-                    ORDER BY COALESCE({page_c}, 999999), {idx_c if has_idx else 'rowid'}
-                """
-                cur = conn.execute(sql, (document_id,))
-                rows = cur.fetchall()
-                cur.close()
-
-                out: List[Dict[str, Any]] = []
-                for r in rows:
-                    t = (r["text"] or "").strip()
-                    if not t:
-                        continue
-                    pg = int(r["page"] or 1)
-                    ci = int(r["chunk_index"] or 0)
-                    out.append({"page": pg, "chunk_index": ci, "text": t})
-                if out:
-                    print(
-                        f"fetch_doc_chunks_robust: hit table={table} "
-                        f"text={text_c} page={page_c} idx={idx_c} -> {len(out)} chunks"
-                    )
-                    return out
-            except Exception as e:
-                print(
-                    f"fetch_doc_chunks_robust: failed on {table} "
-                    f"({text_c},{page_c},{idx_c}): {e}"
-                )
-                continue
-    print("fetch_doc_chunks_robust: no layouts matched; returning []")
-    return []
+    Tries multiple table/column layouts seen in your DBs (resolved once per DB,
+    see resolve_chunk_layouts).
+    """
+    out = fetch_chunks_for_documents(conn, [document_id]).get(int(document_id), [])
+    if not out:
+        print("fetch_doc_chunks_robust: no layouts matched; returning []")
+    return out
 
 def get_company_id_for_ticker(
     conn: sqlite3.Connection,
@@ -269,61 +485,47 @@ def dynamic_company_pool(
             )
             doc_ids = []
 
+    # all surface forms in one matcher -> one pass per document
+    matcher = company_matcher.compile_matcher([(company_id, legal_name, ticker, aliases)])
+
     if not doc_ids:
-        try:
-            cur = conn.execute("SELECT document_id FROM document")
-            doc_ids = [int(r["document_id"]) for r in cur.fetchall()]
-            cur.close()
-        except Exception as e:
-            print(f"dynamic_company_pool: failed to list document ids: {e}")
-            return []
+        # the postings index narrows the corpus to docs that can contain a form
+        candidates = candidate_documents_for_forms(conn, matcher["forms"])
+        if candidates is not None:
+            doc_ids = candidates
+        else:
+            try:
+                cur = conn.execute("SELECT document_id FROM document")
+                doc_ids = [int(r["document_id"]) for r in cur.fetchall()]
+                cur.close()
+            except Exception as e:
+                print(f"dynamic_company_pool: failed to list document ids: {e}")
+                return []
 
     print(
         f"dynamic_company_pool: scanning {len(doc_ids)} docs for "
         f"ticker={ticker}, company_id={company_id}"
     )
 
-    # patterns
-    name_pat = (
-        config.WORD_BOUNDARY.format(term=re.escape(legal_name.lower()))
-        if legal_name
-        else None
-    )
-    ticker_pat = config.WORD_BOUNDARY.format(term=re.escape(ticker.lower()))
-
-    alias_pats: List[str] = []
-    for al in aliases:
-        al = al.strip()
-        if not al:
-            continue
-        alias_pats.append(config.WORD_BOUNDARY.format(term=re.escape(al.lower())))
-
     hit_rows: List[Dict[str, Any]] = []
 
-    for did in doc_ids:
-        chunks = fetch_doc_chunks_robust(conn, did)
+    for did, chunks in iter_chunks_for_documents(conn, doc_ids):
         if not chunks:
             continue
         low_text = " ".join(ch["text"] for ch in chunks).lower()
 
-        name_hits = safe_regex_count(name_pat, low_text) if name_pat else 0
-        ticker_hits = safe_regex_count(ticker_pat, low_text) if ticker_pat else 0
-        alias_hits = 0
-        for pat in alias_pats:
-            alias_hits += safe_regex_count(pat, low_text)
-
-        total_hits = name_hits + ticker_hits + alias_hits
-        if total_hits <= 0:
+        hits = company_matcher.count_hits(matcher, low_text).get(company_id)
+        if not hits:
             continue
 
         hit_rows.append(
             {
                 "document_id": did,
                 "company_id": company_id,
-                "name_hits": name_hits,
-                "ticker_hits": ticker_hits,
-                "alias_hits": alias_hits,
-                "total_hits": total_hits,
+                "name_hits": hits["name_hits"],
+                "ticker_hits": hits["ticker_hits"],
+                "alias_hits": hits["alias_hits"],
+                "total_hits": hits["total_hits"],
             }
         )
 
@@ -338,12 +540,13 @@ def dynamic_company_pool(
     top = hit_rows[:limit_pool]
 
     # enrich to match fetch_doc_pool shape
+    pub_date = _published_date_select(conn)
     pool: List[Dict[str, Any]] = []
     for r in top:
         did = r["document_id"]
         try:
             cur = conn.execute(
-                "SELECT document_id, title, published_at, "
+                f"SELECT document_id, title, published_at, {pub_date}, "
                 "       '' AS source_url, '' AS source_path "
                 "FROM document WHERE document_id=?",
                 (did,),
@@ -359,12 +562,14 @@ def dynamic_company_pool(
 
         title = ""
         published_at = ""
+        published_date = None
         source_url = ""
         source_path = ""
 
         if dmeta:
             keys = dmeta.keys()
             title = (dmeta["title"] or "") if "title" in keys else ""
+            published_date = dmeta["published_date"] if "published_date" in keys else None
             published_at = (
                 dmeta["published_at"] or ""
                 if "published_at" in keys
@@ -386,6 +591,7 @@ def dynamic_company_pool(
                 "document_id": did,
                 "title": title,
                 "published_at": published_at,
+                "published_date": published_date,
                 "source_url": source_url,
                 "source_path": source_path,
                 "company_id": r["company_id"],
@@ -399,6 +605,524 @@ def dynamic_company_pool(
     print(f"dynamic_company_pool: built dynamic pool size={len(pool)}")
     return pool
 
+# Off-book companies found by the LLM at query time are persisted with a
+# negative company_id (-1 stays "runtime-only") and a synthetic ticker, so
+# they never collide with seeded ASX rows.
+DYNAMIC_TICKER_PREFIX = "~"
+_DYNAMIC_PERSIST_LOCK = threading.Lock()
+
+# LLM aliases are only kept when they are this long and contain a distinctive
+# word of the company's name; these words do not identify a company on their own
+DYNAMIC_ALIAS_MIN_LEN = 4
+_NAME_FILLER = {
+    "the", "and", "inc", "ltd", "limited", "group", "holdings", "holding", "corp", "corporation",
+    "company", "co", "com", "plc", "llc", "pty", "ag", "sa", "nv", "international", "global",
+}
+
+def _distinctive_name_words(*names: Optional[str]) -> set:
+    return {w for n in names for w in term_index.tokenize(n) if len(w) >= 3 and w not in _NAME_FILLER}
+
+def persistable_aliases(
+    company_name: str,
+    short_name: Optional[str],
+    aliases: Iterable[str],
+) -> List[str]:
+    """
+    The aliases of an off-book company that may go into the company index:
+    at least DYNAMIC_ALIAS_MIN_LEN characters and sharing a distinctive word
+    with the legal or short name ("Amazon Prime" for Amazon, not "Prime"), so
+    a generic word never routes unrelated questions to the company.
+    """
+    name_words = _distinctive_name_words(company_name, short_name)
+    out, seen = [], set()
+    for a in aliases:
+        a = (a or "").strip()
+        if len(a) < DYNAMIC_ALIAS_MIN_LEN or a.upper() in seen:
+            continue
+        if name_words & set(term_index.tokenize(a)):
+            out.append(a)
+            seen.add(a.upper())
+    return out
+
+def dynamic_company_ticker(company_name: str) -> str:
+    return DYNAMIC_TICKER_PREFIX + " ".join((company_name or "").upper().split())
+
+def find_dynamic_company_id(
+    conn: sqlite3.Connection,
+    company_name: str,
+) -> Optional[int]:
+    """company_id of a previously persisted off-book company, or None."""
+    if not (company_name or "").strip():
+        return None
+    return get_company_id_for_ticker(conn, dynamic_company_ticker(company_name))
+
+def resolve_dynamic_company_ids(
+    conn: sqlite3.Connection,
+    text: str,
+) -> List[int]:
+    """
+    Persisted off-book companies whose name or aliases appear in text
+    (same word-boundary rules as the counts).
+    """
+    if not text:
+        return []
+    cur = conn.execute("SELECT company_id, legal_name FROM ref_company WHERE company_id < 0")
+    names = {int(r["company_id"]): r["legal_name"] for r in cur.fetchall()}
+    cur.close()
+    if not names:
+        return []
+
+    aliases: Dict[int, List[str]] = {}
+    if "ref_company_alias" in _table_names(conn):
+        cur = conn.execute("SELECT company_id, alias FROM ref_company_alias WHERE company_id < 0")
+        for r in cur.fetchall():
+            aliases.setdefault(int(r["company_id"]), []).append(r["alias"])
+        cur.close()
+
+    # rows persisted before aliases were filtered are filtered here
+    matcher = company_matcher.compile_matcher(
+        (cid, name, None, persistable_aliases(name, None, aliases.get(cid, []))) for cid, name in names.items()
+    )
+    return sorted(company_matcher.count_hits(matcher, text.lower()))
+
+def _ensure_company_index_tables(conn: sqlite3.Connection):
+    # Same DDL as db_insert_company_counts, for DBs it has not run on yet
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ref_company_alias (
+            company_id INTEGER NOT NULL,
+            alias      TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS company_term_count (
+            document_id     INTEGER NOT NULL,
+            company_id      INTEGER NOT NULL,
+            name_hits       INTEGER NOT NULL,
+            ticker_hits     INTEGER NOT NULL,
+            total_hits      INTEGER NOT NULL,
+            last_scanned_at TEXT    NOT NULL,
+            alias_hits      INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_alias_pair ON ref_company_alias(company_id, UPPER(alias))")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_ctc_doc_company ON company_term_count(document_id, company_id)")
+    # Provenance of companies persisted at query time, for audit / purge
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dynamic_company (
+            company_id  INTEGER PRIMARY KEY,
+            source      TEXT NOT NULL,
+            query       TEXT,
+            created_at  TEXT NOT NULL,
+            updated_at  TEXT NOT NULL
+        )
+    """)
+    now = datetime.datetime.utcnow().isoformat()
+    conn.execute(
+        "INSERT OR IGNORE INTO dynamic_company(company_id, source, created_at, updated_at) "
+        "SELECT company_id, 'llm', ?, ? FROM ref_company WHERE company_id < 0",
+        (now, now),
+    )
+
+def persist_dynamic_company(
+    db_path: str,
+    company_name: str,
+    aliases: List[str],
+    hit_rows: List[Dict[str, Any]],
+    query: str = "",
+) -> Optional[int]:
+    """
+    Upsert an off-book company into ref_company / ref_company_alias and replace
+    its company_term_count rows with hit_rows (a full-corpus scan, as built by
+    query_manager.dynamic_company, counting the persistable_aliases only).
+    The company is recorded in dynamic_company with the triggering query.
+    Opens its own connection; returns the synthetic company_id.
+    """
+    company_name = (company_name or "").strip()
+    if not company_name:
+        return None
+
+    with _DYNAMIC_PERSIST_LOCK:
+        conn = db(db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            _ensure_company_index_tables(conn)
+
+            company_id = find_dynamic_company_id(conn, company_name)
+            if company_id is None:
+                row = conn.execute("SELECT MIN(company_id) FROM ref_company").fetchone()
+                company_id = min(row[0] if row[0] is not None else 0, -1) - 1
+                conn.execute(
+                    "INSERT INTO ref_company(company_id, legal_name, ticker) VALUES (?, ?, ?)",
+                    (company_id, company_name, dynamic_company_ticker(company_name)),
+                )
+
+            keep = {a.upper(): a for a in persistable_aliases(company_name, None, aliases) if a.upper() != company_name.upper()}
+            have = set()
+            for r in conn.execute("SELECT alias FROM ref_company_alias WHERE company_id=?", (company_id,)).fetchall():
+                if persistable_aliases(company_name, None, [r[0]]):
+                    have.add((r[0] or "").upper())
+                else:
+                    # stored before aliases were filtered
+                    conn.execute("DELETE FROM ref_company_alias WHERE company_id=? AND alias=?", (company_id, r[0]))
+            for key, a in keep.items():
+                if key not in have:
+                    conn.execute("INSERT INTO ref_company_alias(company_id, alias) VALUES (?, ?)", (company_id, a))
+
+            now = datetime.datetime.utcnow().isoformat()
+            conn.execute(
+                "INSERT INTO dynamic_company(company_id, source, query, created_at, updated_at) VALUES (?, 'llm', ?, ?, ?) "
+                "ON CONFLICT(company_id) DO UPDATE SET query = excluded.query, updated_at = excluded.updated_at",
+                (company_id, query or None, now, now),
+            )
+            conn.execute("DELETE FROM company_term_count WHERE company_id=?", (company_id,))
+            conn.executemany(
+                """
+                INSERT INTO company_term_count(document_id, company_id, name_hits, ticker_hits, alias_hits, total_hits, last_scanned_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (r["document_id"], company_id, r["name_hits"], r["ticker_hits"], r["alias_hits"], r["total_hits"], now)
+                    for r in hit_rows
+                ],
+            )
+            conn.commit()
+            print(f"persist_dynamic_company: {company_name!r} -> company_id={company_id}, {len(hit_rows)} count rows")
+            return company_id
+        except Exception as e:
+            conn.rollback()
+            print(f"persist_dynamic_company: failed for {company_name!r}: {e}")
+            return None
+        finally:
+            conn.close()
+
+def persist_dynamic_company_async(
+    conn: sqlite3.Connection,
+    company_name: str,
+    aliases: List[str],
+    hit_rows: List[Dict[str, Any]],
+    query: str = "",
+) -> Optional[threading.Thread]:
+    """Run persist_dynamic_company on a daemon thread (skipped for in-memory DBs)."""
+    db_path = _db_file(conn)
+    if not db_path:
+        return None
+    t = threading.Thread(
+        target=persist_dynamic_company,
+        args=(db_path, company_name, list(aliases), list(hit_rows), query),
+        daemon=True,
+    )
+    t.start()
+    return t
+
+def list_dynamic_companies(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Persisted off-book companies with provenance, aliases and the number of documents they count in."""
+    if "dynamic_company" not in _table_names(conn):
+        return []
+    out = []
+    for r in conn.execute("""
+        SELECT rc.company_id, rc.legal_name, dc.source, dc.query, dc.created_at, dc.updated_at
+        FROM dynamic_company dc JOIN ref_company rc ON rc.company_id = dc.company_id
+        ORDER BY dc.updated_at DESC
+    """).fetchall():
+        cid = int(r["company_id"])
+        out.append({
+            **dict(r),
+            "aliases": [a[0] for a in conn.execute("SELECT alias FROM ref_company_alias WHERE company_id=? ORDER BY alias", (cid,))],
+            "documents": conn.execute("SELECT COUNT(*) FROM company_term_count WHERE company_id=?", (cid,)).fetchone()[0],
+        })
+    return out
+
+def purge_dynamic_companies(
+    conn: sqlite3.Connection,
+    company_ids: Optional[Sequence[int]] = None,
+    older_than_days: Optional[float] = None,
+) -> int:
+    """
+    Delete persisted off-book companies (all, the given ids, and/or those not
+    updated for older_than_days) with their aliases, counts and document links.
+    Runs in the caller's transaction; returns companies deleted.
+    """
+    if "dynamic_company" not in _table_names(conn):
+        return 0
+    sql, params = "SELECT company_id FROM dynamic_company WHERE 1=1", []
+    if company_ids is not None:
+        sql += " AND company_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(c) for c in company_ids]))
+    if older_than_days is not None:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=older_than_days)
+        sql += " AND updated_at < ?"
+        params.append(cutoff.isoformat())
+    ids = json.dumps([int(r[0]) for r in conn.execute(sql, params).fetchall()])
+    tables = _table_names(conn)
+    for table in ("ref_company_alias", "company_term_count", "document_company", "ref_company", "dynamic_company"):
+        if table in tables:
+            conn.execute(f"DELETE FROM {table} WHERE company_id IN (SELECT value FROM json_each(?))", (ids,))
+    return len(json.loads(ids))
+
+# ---- company_term_count maintenance (shared by ingest_dir / db_insert_company_counts) ----
+
+def load_company_matcher(
+    conn: sqlite3.Connection,
+    company_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """company_matcher over ref_company name/ticker + ref_company_alias (optionally a subset)."""
+    where, params = "", ()
+    if company_ids is not None:
+        where, params = "WHERE company_id IN (SELECT value FROM json_each(?))", (json.dumps([int(c) for c in company_ids]),)
+    cur = conn.execute(f"SELECT company_id, legal_name, COALESCE(ticker,'') AS ticker FROM ref_company {where}", params)
+    companies = cur.fetchall()
+    cur.close()
+
+    alias_map: Dict[int, List[str]] = {}
+    if "ref_company_alias" in _table_names(conn):
+        cur = conn.execute(f"SELECT company_id, alias FROM ref_company_alias {where}", params)
+        for r in cur.fetchall():
+            alias_map.setdefault(r["company_id"], []).append((r["alias"] or "").strip())
+        cur.close()
+    for c in companies:
+        if c["company_id"] < 0 and c["company_id"] in alias_map:
+            # off-book companies: only aliases that name them (older rows were unfiltered)
+            alias_map[c["company_id"]] = persistable_aliases(c["legal_name"], None, alias_map[c["company_id"]])
+
+    return company_matcher.compile_matcher(
+        (c["company_id"], (c["legal_name"] or "").strip(), (c["ticker"] or "").strip(), alias_map.get(c["company_id"], []))
+        for c in companies
+    )
+
+def company_counts_use_links(conn: sqlite3.Connection) -> bool:
+    """
+    Same rule as the full rebuild: once document_company has rows, counts are
+    kept for linked (document, company) pairs only, zero hits included;
+    otherwise for every company with at least one hit.
+    """
+    if "document_company" not in _table_names(conn):
+        return False
+    return conn.execute("SELECT 1 FROM document_company LIMIT 1").fetchone() is not None
+
+def company_term_rows(
+    matcher: Dict[str, Any],
+    document_id: int,
+    low_text: str,
+    now: str,
+    linked_ids: Optional[Sequence[int]] = None,
+) -> List[Tuple]:
+    """company_term_count rows for one document (see company_counts_use_links)."""
+    hits = company_matcher.count_hits(matcher, low_text)
+    rows = []
+    for cid in (hits if linked_ids is None else linked_ids):
+        h = hits.get(cid)
+        nh, th, ah = (h["name_hits"], h["ticker_hits"], h["alias_hits"]) if h else (0, 0, 0)
+        rows.append((document_id, cid, nh, th, ah, nh + th + ah, now))
+    return rows
+
+def upsert_company_term_counts(conn: sqlite3.Connection, rows: List[Tuple]) -> int:
+    if not rows:
+        return 0
+    conn.executemany("""
+        INSERT INTO company_term_count(document_id, company_id, name_hits, ticker_hits, alias_hits, total_hits, last_scanned_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(document_id, company_id) DO UPDATE SET
+          name_hits       = excluded.name_hits,
+          ticker_hits     = excluded.ticker_hits,
+          alias_hits      = excluded.alias_hits,
+          total_hits      = excluded.total_hits,
+          last_scanned_at = excluded.last_scanned_at
+    """, rows)
+    return len(rows)
+
+def update_company_counts_for_document(
+    conn: sqlite3.Connection,
+    document_id: int,
+    texts: List[str],
+    matcher: Optional[Dict[str, Any]] = None,
+) -> int:
+    """
+    Recount one new/changed document against every company. Runs in the
+    caller's transaction (no commit). Returns rows written.
+    """
+    if "company_term_count" not in _table_names(conn):
+        return 0
+    if matcher is None:
+        matcher = load_company_matcher(conn)
+
+    linked_ids = None
+    if company_counts_use_links(conn):
+        cur = conn.execute(
+            "SELECT dc.company_id FROM document_company dc "
+            "JOIN ref_company rc ON rc.company_id = dc.company_id WHERE dc.document_id=?",
+            (document_id,),
+        )
+        linked_ids = [int(r[0]) for r in cur.fetchall()]
+        cur.close()
+
+    low = " \n".join(t or "" for t in texts).lower()
+    rows = company_term_rows(matcher, document_id, low, datetime.datetime.utcnow().isoformat(), linked_ids)
+    conn.execute("DELETE FROM company_term_count WHERE document_id=?", (document_id,))
+    return upsert_company_term_counts(conn, rows)
+
+def recount_company(
+    conn: sqlite3.Connection,
+    company_id: int,
+    batch_size: int = 200,
+) -> int:
+    """
+    Recount ONE company across the corpus (e.g. after its aliases changed),
+    replacing its company_term_count rows. Runs in the caller's transaction.
+    """
+    matcher = load_company_matcher(conn, [company_id])
+    use_links = company_counts_use_links(conn)
+    if use_links:
+        cur = conn.execute("SELECT document_id FROM document_company WHERE company_id=?", (company_id,))
+    else:
+        cur = conn.execute("SELECT document_id FROM document")
+    doc_ids = [int(r[0]) for r in cur.fetchall()]
+    cur.close()
+
+    now = datetime.datetime.utcnow().isoformat()
+    conn.execute("DELETE FROM company_term_count WHERE company_id=?", (company_id,))
+    n = 0
+    for did, chunks in iter_chunks_for_documents(conn, doc_ids, batch_size):
+        low = " \n".join(ch["text"] for ch in chunks).lower()
+        n += upsert_company_term_counts(
+            conn, company_term_rows(matcher, did, low, now, [company_id] if use_links else None)
+        )
+    print(f"recount_company: company_id={company_id} -> {n} rows over {len(doc_ids)} docs")
+    return n
+
+# ---- token postings index (term_vocab / term_posting / term_doc, built by ingest_dir) ----
+
+def has_term_index(conn: sqlite3.Connection) -> bool:
+    return {"term_vocab", "term_posting", "term_doc"} <= _table_names(conn)
+
+def unindexed_document_ids(conn: sqlite3.Connection) -> List[int]:
+    """Documents with no term_doc row yet (ingested before the index existed)."""
+    cur = conn.execute(
+        "SELECT document_id FROM document d "
+        "WHERE NOT EXISTS (SELECT 1 FROM term_doc t WHERE t.document_id = d.document_id)"
+    )
+    ids = [int(r[0]) for r in cur.fetchall()]
+    cur.close()
+    return ids
+
+def phrase_postings(
+    conn: sqlite3.Connection,
+    phrase: str,
+    document_ids: Optional[Sequence[int]] = None,
+    with_pages: bool = False,
+) -> Optional[Dict[int, Dict[str, Any]]]:
+    """
+    Count a term or phrase per document from the postings index.
+
+    Returns {document_id: {"count", "pages"}} for documents with >= 1
+    occurrence (pages only when with_pages), or None when the phrase has no
+    indexable token or there is no index (caller falls back to scanning text).
+    Phrases are consecutive tokens; occurrences never overlap.
+    """
+    tokens = term_index.tokenize(phrase)
+    if not tokens or not has_term_index(conn):
+        return None
+
+    cur = conn.execute(
+        "SELECT term, term_id FROM term_vocab WHERE term IN (SELECT value FROM json_each(?))",
+        (json.dumps(sorted(set(tokens))),),
+    )
+    term_ids = {r[0]: int(r[1]) for r in cur.fetchall()}
+    cur.close()
+    if len(term_ids) < len(set(tokens)):
+        return {}
+
+    sql = "SELECT term_id, document_id, tf, positions FROM term_posting WHERE term_id IN (SELECT value FROM json_each(?))"
+    params: Tuple = (json.dumps(sorted(set(term_ids.values()))),)
+    if document_ids is not None:
+        sql += " AND document_id IN (SELECT value FROM json_each(?))"
+        params += (json.dumps([int(d) for d in document_ids]),)
+
+    by_doc: Dict[int, Dict[int, Any]] = {}
+    cur = conn.execute(sql, params)
+    for r in cur.fetchall():
+        by_doc.setdefault(int(r["document_id"]), {})[int(r["term_id"])] = r
+    cur.close()
+
+    need = [term_ids[t] for t in tokens]
+    out: Dict[int, Dict[str, Any]] = {}
+    starts_by_doc: Dict[int, np.ndarray] = {}
+    for did, rows in by_doc.items():
+        if len(rows) < len(set(need)):
+            continue
+        if len(need) == 1 and not with_pages:
+            out[did] = {"count": int(rows[need[0]]["tf"]), "pages": []}
+            continue
+        decoded = {tid: term_index.decode_positions(r["positions"]) for tid, r in rows.items()}
+        starts = term_index.phrase_positions([decoded[tid] for tid in need])
+        if starts.size:
+            out[did] = {"count": int(starts.size), "pages": []}
+            starts_by_doc[did] = starts
+
+    if with_pages and out:
+        cur = conn.execute(
+            "SELECT document_id, chunk_starts, chunk_pages FROM term_doc "
+            "WHERE document_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(out)),),
+        )
+        for r in cur.fetchall():
+            cs = np.frombuffer(r["chunk_starts"], dtype=term_index.POSTING_DTYPE)
+            cp = np.frombuffer(r["chunk_pages"], dtype=term_index.POSTING_DTYPE)
+            did = int(r["document_id"])
+            out[did]["pages"] = term_index.pages_for_positions(starts_by_doc[did], cs, cp)
+        cur.close()
+    return out
+
+def term_document_counts(
+    conn: sqlite3.Connection,
+    phrase: str,
+    document_ids: Optional[Sequence[int]] = None,
+) -> Optional[Dict[int, int]]:
+    """{document_id: occurrences} via the postings index (None = not answerable from the index)."""
+    hits = phrase_postings(conn, phrase, document_ids)
+    if hits is None:
+        return None
+    return {did: h["count"] for did, h in hits.items()}
+
+def document_token_counts(
+    conn: sqlite3.Connection,
+    document_ids: Sequence[int],
+) -> Dict[int, int]:
+    """{document_id: indexed token count} from term_doc ({} without an index)."""
+    if not document_ids or not has_term_index(conn):
+        return {}
+    cur = conn.execute(
+        "SELECT document_id, n_tokens FROM term_doc WHERE document_id IN (SELECT value FROM json_each(?))",
+        (json.dumps(sorted({int(d) for d in document_ids})),),
+    )
+    out = {int(r[0]): int(r[1]) for r in cur.fetchall()}
+    cur.close()
+    return out
+
+def candidate_documents_for_forms(
+    conn: sqlite3.Connection,
+    forms: Iterable[str],
+) -> Optional[List[int]]:
+    """
+    Documents that can contain a word-boundary hit of any form: those whose
+    postings have the form's tokens in sequence, plus any not yet indexed.
+    None when the index cannot narrow the scan (no index / a form with no token).
+    """
+    if not has_term_index(conn):
+        return None
+    docs = set(unindexed_document_ids(conn))
+    for f in forms:
+        hits = phrase_postings(conn, f)
+        if hits is None:
+            return None
+        docs.update(hits)
+    return sorted(docs)
+
+def _id_batches(ids: Sequence[int], size: int = 500):
+    """Yield slices of ids small enough for one `IN (...)` (SQLite variable limit)."""
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
 def get_context_chunks_for_sources(conn, sources_for_prompt):
     """
     Build context text in EXACT SAME ORDER as sources_for_prompt.
@@ -406,11 +1130,36 @@ def get_context_chunks_for_sources(conn, sources_for_prompt):
       - pages are sorted
       - S# aligns correctly
       - chunks returned in stable logical order
+
+    All chunks for all sources are pulled with one `IN (...)` query and
+    grouped here by (document_id, page), instead of one query per page.
     """
     context_blocks = []
 
+    doc_ids = sorted({int(src["document_id"]) for src in sources_for_prompt})
+    if not doc_ids:
+        return context_blocks
+
+    # (document_id, page) -> texts in chunk_index order
+    texts_by_page: Dict[Tuple[int, int], List[str]] = {}
+    for part in _id_batches(doc_ids):
+        qmarks = ",".join("?" * len(part))
+        rows = conn.execute(
+            f"""
+            SELECT document_id, text, page_start
+            FROM chunk
+            WHERE document_id IN ({qmarks})
+              AND page_start IS NOT NULL
+            ORDER BY document_id, page_start, chunk_index ASC, chunk_id ASC
+            """,
+            part,
+        ).fetchall()
+        for r in rows:
+            key = (int(r["document_id"]), r["page_start"])
+            texts_by_page.setdefault(key, []).append(decode_text(r["text"]))
+
     for s_idx, src in enumerate(sources_for_prompt, start=1):
-        doc_id = src["document_id"]
+        doc_id = int(src["document_id"])
 
         pages = src.get("pages", [])
 
@@ -418,19 +1167,8 @@ def get_context_chunks_for_sources(conn, sources_for_prompt):
         pages = sorted(set(pages))
 
         for page in pages:
-            rows = conn.execute(
-                """
-                SELECT text, page_start, page_end, chunk_index
-                FROM chunk
-                WHERE document_id = ?
-                  AND page_start = ?
-                ORDER BY chunk_index ASC
-                """,
-                (doc_id, page)
-            ).fetchall()
-
-            for r in rows:
-                txt = (r["text"] or "").strip()
+            for text in texts_by_page.get((doc_id, page), []):
+                txt = (text or "").strip()
                 if not txt:
                     continue
 
@@ -440,6 +1178,160 @@ def get_context_chunks_for_sources(conn, sources_for_prompt):
 
     return context_blocks
 
+def load_chunk_vectors(
+    conn: sqlite3.Connection,
+    document_ids: Optional[Sequence[int]] = None,
+) -> Tuple[List[int], List[int], np.ndarray]:
+    """
+    Chunk embeddings from chunk_vec as (chunk_ids, document_ids, matrix[n, dim]).
+
+    With no document_ids this is one sequential scan of chunk_vec (in chunk_id
+    order); otherwise only the chunks of those documents. Vectors whose dim
+    differs from the first one are skipped.
+    """
+    if not has_table(conn, "main", "chunk_vec"):
+        return [], [], np.zeros((0, 0), dtype=np.float32)
+    if document_ids is None:
+        sql = """
+            SELECT v.chunk_id, c.document_id, v.dim, v.dtype, v.data
+            FROM chunk_vec v JOIN chunk c ON c.chunk_id = v.chunk_id
+            ORDER BY v.chunk_id
+        """
+        params: Tuple = ()
+    else:
+        sql = """
+            SELECT v.chunk_id, c.document_id, v.dim, v.dtype, v.data
+            FROM chunk c JOIN chunk_vec v ON v.chunk_id = c.chunk_id
+            WHERE c.document_id IN (SELECT value FROM json_each(?))
+            ORDER BY v.chunk_id
+        """
+        params = (json.dumps(sorted({int(d) for d in document_ids})),)
+
+    chunk_ids: List[int] = []
+    doc_ids: List[int] = []
+    vecs: List[np.ndarray] = []
+    dim = None
+    for r in conn.execute(sql, params):
+        if dim is None:
+            dim = int(r["dim"])
+        if int(r["dim"]) != dim:
+            continue
+        chunk_ids.append(int(r["chunk_id"]))
+        doc_ids.append(int(r["document_id"]))
+        vecs.append(np.frombuffer(r["data"], dtype=np.dtype(r["dtype"])).astype(np.float32))
+    if not vecs:
+        return [], [], np.zeros((0, 0), dtype=np.float32)
+    return chunk_ids, doc_ids, np.vstack(vecs)
+
+def load_document_centroids(
+    conn: sqlite3.Connection,
+    document_ids: Sequence[int],
+) -> Tuple[List[int], np.ndarray]:
+    """
+    Document centroid embeddings from document_vec as (document_ids, matrix[n, dim]),
+    in one query. Documents without a centroid are left out.
+    """
+    if not document_ids or not has_table(conn, "main", "document_vec"):
+        return [], np.zeros((0, 0), dtype=np.float32)
+    rows = conn.execute(
+        "SELECT document_id, dim, dtype, data FROM document_vec "
+        "WHERE document_id IN (SELECT value FROM json_each(?))",
+        (json.dumps(sorted({int(d) for d in document_ids})),),
+    ).fetchall()
+    if not rows:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    dim = int(rows[0]["dim"])
+    rows = [r for r in rows if int(r["dim"]) == dim]
+    ids = [int(r["document_id"]) for r in rows]
+    mat = np.vstack([np.frombuffer(r["data"], dtype=np.dtype(r["dtype"])) for r in rows]).astype(np.float32)
+    return ids, mat
+
+def fetch_document_overviews(
+    conn: sqlite3.Connection,
+    document_ids: Sequence[int],
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Pre-joined page-1 text per document from the
+    document_overview table built at ingest. Documents without a row are
+    simply missing from the result; {} when the table does not exist.
+    """
+    out: Dict[int, Dict[str, Any]] = {}
+    if not document_ids or not has_table(conn, "main", "document_overview"):
+        return out
+    for part in _id_batches(sorted({int(d) for d in document_ids})):
+        qmarks = ",".join("?" * len(part))
+        rows = conn.execute(
+            f"SELECT document_id, page1_text FROM document_overview WHERE document_id IN ({qmarks})",
+            part,
+        ).fetchall()
+        for r in rows:
+            out[int(r["document_id"])] = {"page1_text": r["page1_text"] or ""}
+    return out
+
+def fetch_leading_chunks(
+    conn: sqlite3.Connection,
+    document_ids: Sequence[int],
+    max_chunks_per_doc: int,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    First `max_chunks_per_doc` chunks (by chunk_index) of every document,
+    in one windowed query rather than one LIMIT query per document.
+
+    Returns {document_id: [{text, section, chunk_index, page_start, page_end}, ...]}
+    """
+    out: Dict[int, List[Dict[str, Any]]] = {}
+    for part in _id_batches(sorted({int(d) for d in document_ids})):
+        qmarks = ",".join("?" * len(part))
+        rows = conn.execute(
+            f"""
+            SELECT document_id, text, section, chunk_index, page_start, page_end
+            FROM (
+                SELECT document_id, text, section, chunk_index, page_start, page_end,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY document_id
+                           ORDER BY chunk_index ASC, chunk_id ASC
+                       ) AS rn
+                FROM chunk
+                WHERE document_id IN ({qmarks})
+            )
+            WHERE rn <= ?
+            ORDER BY document_id, rn
+            """,
+            (*part, max_chunks_per_doc),
+        ).fetchall()
+        for r in rows:
+            row = dict(r)
+            row["text"] = decode_text(row["text"])
+            out.setdefault(int(r["document_id"]), []).append(row)
+    return out
+
+def fetch_document_pages(
+    conn: sqlite3.Connection,
+    document_ids: Sequence[int],
+) -> Dict[int, set]:
+    """
+    All page numbers (page_start/page_end) seen in each document's chunks,
+    for many documents at once.
+    """
+    out: Dict[int, set] = {}
+    for part in _id_batches(sorted({int(d) for d in document_ids})):
+        qmarks = ",".join("?" * len(part))
+        rows = conn.execute(
+            f"""
+            SELECT DISTINCT document_id, page_start, page_end
+            FROM chunk
+            WHERE document_id IN ({qmarks})
+            """,
+            part,
+        ).fetchall()
+        for r in rows:
+            pages = out.setdefault(int(r["document_id"]), set())
+            if isinstance(r["page_start"], int):
+                pages.add(r["page_start"])
+            if isinstance(r["page_end"], int):
+                pages.add(r["page_end"])
+    return out
+
 def print_gen_doc_ids(conn):
     # Resolve the company_id for GEN
     gen_ids = resolve_company_ids(conn, ["GEN"])
@@ -498,6 +1390,7 @@ def get_document_fields(
         }
 
     title, published_at, file_uri, mime_type, meta_json = row
+    meta_json = decode_text(meta_json)
 
     meta: Dict[str, Any] = {}
     if meta_json:
@@ -1,3 +1,6 @@
+from typing import List, Optional
+
+import numpy as np
 from openai import OpenAI
 import config
 
@@ -264,3 +267,13 @@ def main_answer(query, candidates_block, sources_text, use_case, last_query_refe
     
     print(f"openai_manager:main_answer:DEBUG: llm_response: {out}")
     return out
+
+def embed_query(text: str) -> Optional[np.ndarray]:
+    """Unit-normalised embedding of the query (same model as ingest), or None on failure."""
+    try:
+        r = CLIENT.embeddings.create(model=config.EMBED_MODEL, input=[text])
+        v = np.asarray(r.data[0].embedding, dtype=np.float32)
+        return v / (np.linalg.norm(v) + 1e-9)
+    except Exception as e:
+        print(f"openai_manager:embed_query:ERROR: {e}")
+        return None
@@ -1,6 +1,8 @@
 import config
 import openai_manager
 import database_manager
+import company_matcher
+import term_index
 
 
 import os
@@ -251,6 +253,11 @@ def handle_use_case_1(q, tokens, tickers, conn):
         company_ids = database_manager.resolve_company_ids(conn, tickers)
         print(f"query_manager:handle_use_case_1:DEBUG: fallback company_ids via tickers={company_ids}")
 
+    if not company_ids:
+        # off-book companies persisted by an earlier dynamic_company() run (e.g. Temu)
+        company_ids = database_manager.resolve_dynamic_company_ids(conn, q)
+        print(f"query_manager:handle_use_case_1:DEBUG: persisted off-book company_ids={company_ids}")
+
     # Pre-compute non-company terms for ranking (used later regardless of mode)
     company_words = set(w.lower() for w in cues + tickers)
     extra_terms = [t for t in tokens if t and t.lower() not in company_words]
@@ -339,16 +346,14 @@ def handle_use_case_2(q, tokens, out, conn):
     print(f"query_manager:handle_use_case_2:DEBUG: extra_terms={extra_terms}")
 
     # -------- FLOW: Keyword Sorting 
-    if extra_terms:
-        def term_score(text, terms):
-            t = text.lower()
-            return sum(t.count(term.lower()) for term in terms)
-
+    rank_terms = _ranking_terms(extra_terms)
+    print(f"query_manager:handle_use_case_2:DEBUG: rank_terms={rank_terms}")
+    if rank_terms:
+        scores = keyword_scores(conn, pool, rank_terms)
         scored = []
         for row in pool:
             r = dict(row)
-            text = r.get("title", "") + " " + r.get("clean_text", "")
-            r["extra_term_score"] = term_score(text, extra_terms)
+            r["extra_term_score"] = scores.get(int(r["document_id"]), 0.0)
             scored.append(r)
 
         pool = sorted(scored, key=lambda r: r["extra_term_score"], reverse=True)
@@ -358,6 +363,59 @@ def handle_use_case_2(q, tokens, out, conn):
 def _parse_query(q: str):
     return [t for t in re.split(r"[^A-Za-z0-9\+\&]+", (q or "").strip()) if t]
 
+# Question words / function words kept by _parse_query that say nothing about a
+# document (every report contains "the" and "of")
+_RANK_STOPWORDS = {
+    "a", "about", "after", "all", "also", "an", "and", "any", "are", "as", "at", "be", "been", "before",
+    "between", "but", "by", "can", "could", "did", "do", "does", "doing", "for", "from", "had", "has",
+    "have", "how", "if", "in", "into", "is", "it", "its", "last", "latest", "me", "more", "most", "much",
+    "my", "next", "not", "of", "on", "or", "our", "over", "recent", "recently", "report", "reports",
+    "said", "say", "says", "should", "show", "so", "some", "tell", "than", "that", "the", "their",
+    "them", "then", "there", "these", "they", "this", "those", "to", "up", "was", "we", "were", "what",
+    "when", "where", "which", "while", "who", "why", "will", "with", "would", "you", "your",
+}
+_BM25_K1, _BM25_B = 1.2, 0.75
+
+def _ranking_terms(terms: List[str]) -> List[str]:
+    """Query terms worth ranking on: no stopwords, single words of 3+ characters (phrases kept)."""
+    out = []
+    for t in terms:
+        words = term_index.tokenize(t)
+        words = [w for w in words if len(w) >= 3 and w not in _RANK_STOPWORDS] if len(words) == 1 else words
+        phrase = " ".join(words)
+        if phrase and phrase not in out:
+            out.append(phrase)
+    return out
+
+def keyword_scores(conn, pool: List[Dict[str, Any]], terms: List[str]) -> Dict[int, float]:
+    """
+    BM25 of `terms` per pool document: body term frequencies and document
+    lengths from the postings index (term_doc.n_tokens), idf over the pool,
+    plus idf-weighted title hits. Without an index only titles score.
+    """
+    ids = [int(r["document_id"]) for r in pool]
+    title_text = {int(r["document_id"]): " " + " ".join(term_index.tokenize(dict(r).get("title"))) + " " for r in pool}
+    n_tokens = database_manager.document_token_counts(conn, ids)
+    avg_len = (sum(n_tokens.values()) / len(n_tokens)) if n_tokens else 0.0
+    n = len(ids)
+    scores: Dict[int, float] = {}
+    for term in terms:
+        counts = database_manager.term_document_counts(conn, term, ids) or {}
+        titles = {did: t.count(f" {term} ") for did, t in title_text.items()}
+        df = len(set(counts) | {d for d, c in titles.items() if c})
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for did in ids:
+            tf = counts.get(did, 0)
+            s = idf * titles.get(did, 0)
+            if tf:
+                norm = 1 - _BM25_B + _BM25_B * (n_tokens[did] / avg_len) if did in n_tokens and avg_len else 1.0
+                s += idf * tf * (_BM25_K1 + 1) / (tf + _BM25_K1 * norm)
+            if s:
+                scores[did] = scores.get(did, 0.0) + s
+    return scores
+
 def _guess_tickers(tokens):
     ups = [t.upper() for t in tokens]
     return [tk for tk in config.ASX_COMPANIES.keys() if tk in ups]
@@ -508,8 +566,8 @@ def dynamic_company(
 
     Behaviour:
       - Calls llm_determine_company(user_query) to get company_name + aliases.
-      - Scans all documents' chunks (via database_manager.fetch_doc_chunks_robust)
-        with word-boundary regexes for:
+      - Scans all documents' chunks (batched via database_manager.iter_chunks_for_documents)
+        in one company_matcher pass per document (word-boundary hits) for:
           * company_name      -> name_hits
           * short_name        -> ticker_hits (used as a second "name" bucket)
           * aliases           -> alias_hits
@@ -520,7 +578,12 @@ def dynamic_company(
             "company_id",   # always -1 for off-book companies
             "total_hits", "name_hits", "ticker_hits", "alias_hits"
           }
-      - NO writes to the database.
+      - When config.PERSIST_DYNAMIC_COMPANIES is set and the company's own name
+        occurs in the corpus, it is written to ref_company / ref_company_alias /
+        company_term_count (aliases that name it only, see
+        database_manager.persistable_aliases) and dynamic_company on a background
+        thread, so the next question about it resolves statically. A company
+        persisted earlier is served from company_term_count.
     """
     info = llm_determine_company(user_query)
     if not info:
@@ -534,51 +597,56 @@ def dynamic_company(
     lower_name = company_name.lower()
     lower_short = short_name.lower()
 
-    # Get helpers/constants from database_manager, with safe fallbacks
-    boundary_template = getattr(
-        database_manager,
-        "WORD_BOUNDARY",
-        r"(?<![A-Za-z0-9]){term}(?![A-Za-z0-9])",
-    )
-    safe_count = getattr(
-        database_manager,
-        "safe_regex_count",
-        lambda pattern, text: len(re.findall(pattern, text, flags=re.I)) if pattern and text else 0,
-    )
-
-    name_pat = (
-        boundary_template.format(term=re.escape(lower_name))
-        if lower_name
-        else None
-    )
-    short_pat = (
-        boundary_template.format(term=re.escape(lower_short))
-        if lower_short and lower_short != lower_name
-        else None
-    )
-
-    alias_pats: List[str] = []
+    # name / short name / aliases compiled into one matcher (short_name and
+    # aliases that just repeat the main name are not counted twice)
+    alias_terms: List[str] = []
     for a in aliases:
         if not isinstance(a, str):
             continue
         s = a.strip().lower()
         if not s:
             continue
-        # avoid duplicating the main patterns
         if s == lower_name or s == lower_short:
             continue
-        alias_pats.append(
-            boundary_template.format(term=re.escape(s))
-        )
+        alias_terms.append(s)
+
+    if config.PERSIST_DYNAMIC_COMPANIES:
+        known_id = database_manager.find_dynamic_company_id(conn, company_name or short_name)
+        if known_id is not None:
+            pool = database_manager.fetch_doc_pool(conn, [known_id], limit_pool=limit_pool)
+            print(
+                f"query_manager:dynamic_company:DEBUG: {company_name!r} already persisted as "
+                f"company_id={known_id}; pool size={len(pool)}"
+            )
+            if pool:
+                return pool
+
+    # -1 counts every LLM form for this answer; -2 only the forms that may be
+    # persisted, i.e. that name the company (both in the same pass)
+    # persisted the way recount_company will see it: legal name -> name_hits,
+    # short name and aliases -> alias_hits (the "~NAME" ticker never matches)
+    persist_name = company_name or short_name
+    persist_short = (
+        lower_short if lower_short and lower_short != persist_name.lower()
+        and database_manager.persistable_aliases(persist_name, None, [short_name]) else None
+    )
+    persist_aliases = [a.lower() for a in database_manager.persistable_aliases(persist_name, None, alias_terms)]
+    matcher = company_matcher.compile_matcher([
+        (-1, lower_name or None, lower_short if lower_short and lower_short != lower_name else None, alias_terms),
+        (-2, persist_name.lower() or None, None, ([persist_short] if persist_short else []) + persist_aliases),
+    ])
 
-    # Candidate document set: for off-book companies we just scan all docs
-    try:
-        cur = conn.execute("SELECT document_id FROM document")
-        doc_ids = [int(r["document_id"]) for r in cur.fetchall()]
-        cur.close()
-    except Exception as e:
-        print(f"query_manager:dynamic_company:DEBUG: failed to list document ids: {e}")
-        return []
+    # Candidate document set: docs whose postings contain one of the forms
+    # (all docs when there is no postings index)
+    doc_ids = database_manager.candidate_documents_for_forms(conn, matcher["forms"])
+    if doc_ids is None:
+        try:
+            cur = conn.execute("SELECT document_id FROM document")
+            doc_ids = [int(r["document_id"]) for r in cur.fetchall()]
+            cur.close()
+        except Exception as e:
+            print(f"query_manager:dynamic_company:DEBUG: failed to list document ids: {e}")
+            return []
 
     print(
         f"query_manager:dynamic_company:DEBUG: scanning {len(doc_ids)} docs for "
@@ -586,9 +654,9 @@ def dynamic_company(
     )
 
     hit_rows: List[Dict[str, Any]] = []
+    persist_rows: List[Dict[str, Any]] = []
 
-    for did in doc_ids:
-        chunks = database_manager.fetch_doc_chunks_robust(conn, did)
+    for did, chunks in database_manager.iter_chunks_for_documents(conn, doc_ids):
         if not chunks:
             continue
 
@@ -596,27 +664,35 @@ def dynamic_company(
         if not low_text:
             continue
 
-        name_hits = safe_count(name_pat, low_text) if name_pat else 0
-        ticker_hits = safe_count(short_pat, low_text) if short_pat else 0
-        alias_hits = 0
-        for pat in alias_pats:
-            alias_hits += safe_count(pat, low_text)
-
-        total_hits = name_hits + ticker_hits + alias_hits
-        if total_hits <= 0:
+        all_hits = company_matcher.count_hits(matcher, low_text)
+        if all_hits.get(-2):
+            persist_rows.append({"document_id": did, **all_hits[-2]})
+        hits = all_hits.get(-1)
+        if not hits:
             continue
 
         hit_rows.append(
             {
                 "document_id": did,
                 "company_id": -1,  # off-book / runtime-only company
-                "name_hits": name_hits,
-                "ticker_hits": ticker_hits,
-                "alias_hits": alias_hits,
-                "total_hits": total_hits,
+                "name_hits": hits["name_hits"],
+                "ticker_hits": hits["ticker_hits"],
+                "alias_hits": hits["alias_hits"],
+                "total_hits": hits["total_hits"],
             }
         )
 
+    # persist only a company whose own name (or short name) occurs in the corpus,
+    # with the counts of its persistable aliases
+    named = any(r["name_hits"] for r in persist_rows) or (
+        persist_short is not None and any(r["ticker_hits"] for r in hit_rows)
+    )
+    if config.PERSIST_DYNAMIC_COMPANIES and named:
+        persisted_aliases = ([short_name] if persist_short else []) + persist_aliases
+        database_manager.persist_dynamic_company_async(
+            conn, persist_name, persisted_aliases, persist_rows, query=user_query
+        )
+
     if not hit_rows:
         print("query_manager:dynamic_company:DEBUG: no docs with any hits for this off-book company.")
         return []
@@ -628,12 +704,13 @@ def dynamic_company(
     top = hit_rows[:limit_pool]
 
     # Enrich with basic document metadata to match static pool shape
+    pub_date = database_manager._published_date_select(conn)
     pool: List[Dict[str, Any]] = []
     for r in top:
         did = r["document_id"]
         try:
             cur = conn.execute(
-                "SELECT document_id, title, published_at, "
+                f"SELECT document_id, title, published_at, {pub_date}, "
                 "       '' AS source_url, '' AS source_path "
                 "FROM document WHERE document_id=?",
                 (did,),
@@ -646,12 +723,14 @@ def dynamic_company(
 
         title = ""
         published_at = ""
+        published_date = None
         source_url = ""
         source_path = ""
 
         if dmeta:
             keys = dmeta.keys()
             title = (dmeta["title"] or "") if "title" in keys else ""
+            published_date = dmeta["published_date"] if "published_date" in keys else None
             published_at = (
                 dmeta["published_at"] or ""
                 if "published_at" in keys
@@ -673,6 +752,7 @@ def dynamic_company(
                 "document_id": did,
                 "title": title,
                 "published_at": published_at,
+                "published_date": published_date,
                 "source_url": source_url,
                 "source_path": source_path,
                 "company_id": r["company_id"],        # -1
@@ -703,7 +783,7 @@ def get_doc_path_date(conn, document_id):
         return None
 
     try:
-        meta = json.loads(row[0])
+        meta = json.loads(database_manager.decode_text(row[0]))
     except:
         return None
 
@@ -727,6 +807,15 @@ def get_doc_path_date(conn, document_id):
 
     return full_date
 
+def _parse_published_date(value):
+    """document.published_date (YYYY-MM-DD) -> datetime, or None."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+
 def _score_with_extra_terms(rows, extra_terms):
     terms = [t.lower() for t in extra_terms if t]
     def parse_dt(s):
@@ -754,6 +843,36 @@ def _score_with_extra_terms(rows, extra_terms):
         seen.add(did); out.append(r)
     return out
 
+def rank_pool_by_centroid(conn, q: str, pool: List[Dict[str, Any]], top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Re-rank the first `top_n` candidate docs (all when None) by cosine
+    similarity of the query embedding to each document's centroid embedding
+    (document_vec), one matrix-vector product for the head. The head is still
+    chosen by the existing order, and docs after it keep their place. Head docs
+    without a centroid follow the scored ones in their previous order; if the
+    query can't be embedded the pool is returned unchanged.
+    """
+    head, tail = (pool, []) if top_n is None else (pool[:top_n], pool[top_n:])
+    doc_ids, mat = database_manager.load_document_centroids(conn, [r["document_id"] for r in head])
+    if not doc_ids:
+        return pool
+    qv = openai_manager.embed_query(q)
+    if qv is None or qv.shape[0] != mat.shape[1]:
+        return pool
+
+    sims = dict(zip(doc_ids, (mat @ qv).tolist()))
+    for r in head:
+        if int(r["document_id"]) in sims:
+            r["centroid_sim"] = sims[int(r["document_id"])]
+    scored = [r for r in head if "centroid_sim" in r]
+    rest = [r for r in head if "centroid_sim" not in r]
+    scored.sort(key=lambda r: r["centroid_sim"], reverse=True)  # stable: ties keep pool order
+    print(
+        f"query_manager:rank_pool_by_centroid:DEBUG: scored={len(scored)} unscored={len(rest)} tail={len(tail)} "
+        f"top={[(int(r['document_id']), round(r['centroid_sim'], 3)) for r in scored[:5]]}"
+    )
+    return scored + rest + tail
+
 def _safe_key(row, key):
     # sqlite3.Row supports "in" for keys
     return row[key] if key in row.keys() else None
@@ -761,53 +880,9 @@ def _safe_key(row, key):
 def _fetch_doc_chunks_robust(conn: sqlite3.Connection, document_id: int) -> list[dict]:
     """
     Return rows with unified keys: page:int, chunk_index:int, text:str
-    Tries multiple table/column to accomodate my past DB schemas.
+    Kept for old callers; layout detection now lives in database_manager.
     """
-    candidates = [
-       # (table,           text_col,        page_col,         idx_col)
-        ("chunk",         "text",          "page_start",     "chunk_index"),
-        ("chunk",         "chunk_text",    "page_start",     "chunk_index"),
-        ("chunk",         "content",       "page_no",        "chunk_id"),
-        ("chunks",        "content",       "page_no",        "chunk_id"),
-        ("doc_chunk",     "content",       "page_no",        "chunk_idx"),
-        ("main_chunk",    "content",       "page_no",        "chunk_id"),
-    ]
-    for table, text_c, page_c, idx_c in candidates:
-        # verify table + columns exist
-        try:
-            cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
-        except Exception:
-            continue
-        if {text_c}.issubset(cols) and page_c in cols:
-            # idx is optional
-            has_idx = idx_c in cols
-            try:
-                sql = f"""
-                    SELECT
-                      COALESCE({page_c}, 1) AS page,
-                      {text_c} AS text
-                      {', COALESCE(' + idx_c + ', 0) AS chunk_index' if has_idx else ', 0 AS chunk_index'}
-                    FROM {table}
-                    WHERE document_id = ?
-                    ORDER BY COALESCE({page_c}, 999999), {idx_c if has_idx else 'rowid'}
-                """
-                rows = conn.execute(sql, (document_id,)).fetchall()
-                out = []
-                for r in rows:
-                    t = (r["text"] or "").strip()
-                    if not t:
-                        continue
-                    pg = int(r["page"] or 1)
-                    ci = int(r["chunk_index"] or 0)
-                    out.append({"page": pg, "chunk_index": ci, "text": t})
-                if out:
-                    print(f"query_manager:_fetch_doc_chunks_robust:DEBUG: hit table={table} text={text_c} page={page_c} idx={idx_c} -> {len(out)} chunks")
-                    return out
-            except Exception as e:
-                print(f"query_manager:_fetch_doc_chunks_robust:DEBUG: failed on {table} ({text_c},{page_c},{idx_c}): {e}")
-                continue
-    print("query_manager:_fetch_doc_chunks_robust:DEBUG: no layouts matched; returning []")
-    return []
+    return database_manager.fetch_doc_chunks_robust(conn, document_id)
 
 def _build_context_blocks(
     conn: sqlite3.Connection,
@@ -829,7 +904,10 @@ def _build_context_blocks(
     context_blocks: List[str] = []
     sources_for_prompt: List[Dict[str, Any]] = []
 
-    cur = conn.cursor()
+    # Two batched queries for all refs instead of two per document
+    doc_ids = [int(ref["document_id"]) for ref in refs]
+    leading_by_doc = database_manager.fetch_leading_chunks(conn, doc_ids, max_chunks_per_doc)
+    pages_by_doc = database_manager.fetch_document_pages(conn, doc_ids)
 
     for ref in refs:
         doc_id = ref["document_id"]
@@ -837,24 +915,16 @@ def _build_context_blocks(
         # -----------------------------
         # 1) Fetch limited chunks for context text
         # -----------------------------
-        cur.execute(
-            """
-            SELECT text, section, chunk_index, page_start, page_end
-            FROM chunk
-            WHERE document_id = ?
-            ORDER BY chunk_index ASC
-            LIMIT ?
-            """,
-            (doc_id, max_chunks_per_doc),
-        )
-        rows = cur.fetchall()
+        rows = leading_by_doc.get(int(doc_id), [])
         if not rows:
             continue
 
         pieces: List[str] = []
         pages_from_context = set()
 
-        for text, section, chunk_index, page_start, page_end in rows:
+        for r in rows:
+            text, section = r["text"], r["section"]
+            page_start, page_end = r["page_start"], r["page_end"]
             if not text:
                 continue
 
@@ -886,21 +956,7 @@ def _build_context_blocks(
         #    (not limited by max_chunks_per_doc)
         # -----------------------------
         all_pages_set = set(pages_from_context)
-
-        cur.execute(
-            """
-            SELECT DISTINCT page_start, page_end
-            FROM chunk
-            WHERE document_id = ?
-            """,
-            (doc_id,),
-        )
-        all_page_rows = cur.fetchall()
-        for page_start, page_end in all_page_rows:
-            if isinstance(page_start, int):
-                all_pages_set.add(page_start)
-            if isinstance(page_end, int):
-                all_pages_set.add(page_end)
+        all_pages_set.update(pages_by_doc.get(int(doc_id), set()))
 
         # Final pages list; if still empty, fall back to [1]
         pages = sorted(p for p in all_pages_set if isinstance(p, int)) or [1]
@@ -1249,11 +1305,27 @@ def main_llm_answer(
         cand_lines.append(f"{i}. {s['title']} — {pages}")
     candidates_block = "\n".join(cand_lines) if cand_lines else "No candidates."
 
+    # page 1 comes pre-joined from document_overview where available, so those
+    # sources only need their other pages fetched from the chunk table
+    overviews = database_manager.fetch_document_overviews(
+        conn, [s["document_id"] for s in sources_for_prompt]
+    )
+    fetch_sources = [
+        dict(s, pages=[p for p in (s.get("pages") or []) if p != 1])
+        if int(s["document_id"]) in overviews else s
+        for s in sources_for_prompt
+    ]
+
     # get the full doc text for each of thesources 
-    context_blocks_full = database_manager.get_context_chunks_for_sources(conn, sources_for_prompt)
+    context_blocks_full = database_manager.get_context_chunks_for_sources(conn, fetch_sources)
 
     # extract pg1 and non-pg1 blocks
     non_page1_blocks, page1_blocks = reorder_context_blocks(context_blocks_full)
+    for i, s in enumerate(sources_for_prompt, 1):
+        ov = overviews.get(int(s["document_id"]))
+        if ov and ov["page1_text"].strip() and 1 in (s.get("pages") or []):
+            page1_blocks.append(f"[S{i} p1] {ov['page1_text'].strip()}")
+    page1_blocks.sort(key=lambda b: int(re.match(r"\[S(\d+)", b).group(1)))
     print("query_manager:main_llm_answer:DEBUG: page1_blocks:", len(page1_blocks))
     print("query_manager:main_llm_answer:DEBUG: non_page1_blocks:", len(non_page1_blocks))
 
@@ -1376,7 +1448,7 @@ def build_click_url_from_row(
             return f"/view/{db_label}/{document_id}?page={int(default_page or 1)}"
 
         # Extract absolute path preference from meta; fall back to file_uri
-        meta_raw = row["meta"] or "{}"
+        meta_raw = database_manager.decode_text(row["meta"]) or "{}"
         try:
             meta = json.loads(meta_raw) if isinstance(meta_raw, (str, bytes)) else (meta_raw or {})
         except Exception:
@@ -1447,11 +1519,16 @@ def main(q, top_k, conn, reformulate):
     # STEP 2: Fetch and rank docs that relate to the chosen company
     # =========================================
     
-    # add on the abs path from documents table meta 
+    # add on the path date: read straight from the pool row (document.published_date),
+    # only older DBs without the column fall back to parsing meta per document
     pool = [dict(r) for r in pool]
+    have_published_date = database_manager._col_exists(conn, "document", "published_date")
     for r in pool:
         doc_id = r["document_id"]
-        r["path_date"] = get_doc_path_date(conn, doc_id)
+        if have_published_date:
+            r["path_date"] = _parse_published_date(r.get("published_date"))
+        else:
+            r["path_date"] = get_doc_path_date(conn, doc_id)
     from datetime import datetime
     # Deduplicate by document_id (keep first occurrence)
     seen = set()
@@ -1467,17 +1544,24 @@ def main(q, top_k, conn, reformulate):
     ranked = pool
 
     if use_case == "use_case_2" and not tickers:
-        print("query_manager:main:DEBUG: [RANK] use_case_2 + no tickers -> sorting by lowest total_hits then path_date DESC")
+        print("query_manager:main:DEBUG: [RANK] use_case_2 + no tickers -> sorting by lowest total_hits then path_date DESC, then keyword score")
 
         ranked = sorted(
             pool,
             key=lambda r: (
                 int(r.get("total_hits") or 0),
-                -(r["path_date"].timestamp() if r.get("path_date") else 0)   # SAFE
+                -(r["path_date"].timestamp() if r.get("path_date") else 0),   # SAFE
+                -float(r.get("extra_term_score") or 0.0),
             )
         )
 
 
+    # use case 1 pools are ordered by mention counts, so a report that only repeats
+    # the company name can outrank the one that answers the question; use case 2
+    # keeps its own keyword / lowest-hits orders
+    if config.CENTROID_RANK and use_case == "use_case_1":
+        ranked = rank_pool_by_centroid(conn, q, ranked, top_n=config.CENTROID_RERANK_TOP_N)
+
     picked = ranked[:top_k]
     picked_sorted = sorted(picked, key=pubdate, reverse=True)
     print(
@@ -0,0 +1,88 @@
+import re
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Tokens are lower-cased [a-z0-9] runs: the same character class as the
+# company word boundary, so any word-boundary hit of a form is also a run of
+# consecutive index tokens (the index never misses a document the regex finds).
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+POSTING_DTYPE = "uint32"
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def encode_positions(positions: Sequence[int]) -> bytes:
+    """Sorted positions -> delta-encoded uint32 bytes."""
+    a = np.asarray(positions, dtype=np.int64)
+    return np.diff(a, prepend=0).astype(POSTING_DTYPE).tobytes()
+
+
+def decode_positions(data: bytes) -> np.ndarray:
+    return np.cumsum(np.frombuffer(data, dtype=POSTING_DTYPE), dtype=np.int64)
+
+
+def document_postings(
+    chunks: Iterable[Tuple[Optional[str], Optional[int]]],
+) -> Tuple[Dict[str, List[int]], List[int], List[int]]:
+    """
+    Positional postings for one document.
+
+    chunks: (text, page) in reading order (page, chunk_index). Positions run
+    on across chunks, like the joined text the company scans read.
+
+    Returns ({token: [positions]}, chunk_starts, chunk_pages); chunk_starts[i]
+    is the position of chunk i's first token, chunk_pages[i] its page (0 = unknown).
+    """
+    postings: Dict[str, List[int]] = {}
+    starts: List[int] = []
+    pages: List[int] = []
+    pos = 0
+    for text, page in chunks:
+        toks = tokenize(text)
+        if not toks:
+            continue
+        starts.append(pos)
+        pages.append(int(page) if isinstance(page, int) else 0)
+        for t in toks:
+            postings.setdefault(t, []).append(pos)
+            pos += 1
+    return postings, starts, pages
+
+
+def phrase_positions(token_positions: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Start positions of non-overlapping occurrences of the phrase whose i-th
+    token occurs at token_positions[i] (re.findall semantics: leftmost first).
+    """
+    if not token_positions:
+        return np.empty(0, dtype=np.int64)
+    hits = np.asarray(token_positions[0], dtype=np.int64)
+    for i, p in enumerate(token_positions[1:], start=1):
+        if not hits.size:
+            break
+        hits = np.intersect1d(hits, np.asarray(p, dtype=np.int64) - i, assume_unique=True)
+    n = len(token_positions)
+    if n == 1 or hits.size < 2 or np.all(np.diff(hits) >= n):
+        return hits
+    out, last_end = [], -1
+    for h in hits.tolist():
+        if h >= last_end:
+            out.append(h)
+            last_end = h + n
+    return np.asarray(out, dtype=np.int64)
+
+
+def pages_for_positions(
+    positions: np.ndarray,
+    chunk_starts: np.ndarray,
+    chunk_pages: np.ndarray,
+) -> List[int]:
+    """Distinct (sorted) pages the given token positions fall on."""
+    if not positions.size or not chunk_starts.size:
+        return []
+    idx = np.searchsorted(chunk_starts, positions, side="right") - 1
+    return sorted({int(p) for p in chunk_pages[np.clip(idx, 0, None)] if p})
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chunking evaluation for ingest_dir.merge_chunks: index size and retrieval quality
+per target chunk size (0 = one chunk per paragraph / table cell, the old behaviour).
+
+Blocks come from real DOCX files (--root, read with the streaming reader) or
+from synthetic documents. For every target the same blocks are merged and
+written with ingest_dir.write_chunks into a fresh temporary DB, then:
+  size      -> chunks, mean tokens/chunk, chunk + chunk_fts bytes (after VACUUM),
+               chunk_vec bytes at --dim, tokens sent to the embedding API (overlap included)
+  retrieval -> queries made of 3 random words of a randomly sampled block (words in
+               over half the documents excluded); a query hits when the block's
+               (document, page) is among the pages of the top-k chunks (the backend
+               answers per page). BM25 over chunk_fts always;
+               with --embed also cosine over real embeddings (calls the API).
+
+Usage:
+  python bench_chunking.py --root "Docx Retail copy" --targets 0,150,300,500
+  python bench_chunking.py --docs 100 --queries 500
+"""
+
+import os, sys, re, random, argparse, tempfile, contextlib, io
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ingest_dir
+
+WORDS = ("sales margin growth retail earnings guidance consumer inventory supermarket "
+         "online apparel electronics store rent wages promotion dividend outlook").split()
+
+
+def docx_blocks(root, pattern, limit):
+    docs = []
+    with tempfile.TemporaryDirectory() as media, contextlib.redirect_stdout(io.StringIO()):
+        for path in ingest_dir.discover_files(root, pattern)[:limit or None]:
+            docs.append(list(ingest_dir.stream_docx_chunks(path, Path(media))))
+    return docs
+
+def synthetic_blocks(n_docs, seed=0):
+    """Report-like blocks: prose paragraphs plus tables of short cells."""
+    rnd = random.Random(seed)
+    vocab = WORDS + [f"w{i}" for i in range(20000)]
+    docs = []
+    for _ in range(n_docs):
+        blocks = []
+        for page in range(1, 11):
+            section = f"Section {page // 3}"
+            for _ in range(rnd.randint(2, 6)):
+                blocks.append((" ".join(rnd.choice(vocab) for _ in range(rnd.randint(15, 90))),
+                               {"kind": "paragraph", "section_path": section, "pdf_page": page}))
+            for _ in range(rnd.randint(0, 30)):
+                blocks.append((" ".join(rnd.choice(vocab) for _ in range(rnd.randint(1, 4))),
+                               {"kind": "table_cell", "section_path": section, "pdf_page": page}))
+        docs.append(blocks)
+    return docs
+
+def make_queries(docs, n, seed=0):
+    """(doc index, page, query words): 3 random words of a sampled block, none in over half the documents."""
+    df = Counter()
+    for blocks in docs:
+        df.update({w for text, _ in blocks for w in re.findall(r"[a-z0-9]+", text.lower())})
+    common = {w for w, n in df.items() if n > len(docs) // 2}
+    rnd = random.Random(seed)
+    pool = [(d, text, meta.get("pdf_page")) for d, blocks in enumerate(docs) for text, meta in blocks
+            if len(set(re.findall(r"[a-z0-9]+", text.lower())) - common) >= 3]
+    queries = []
+    for d, text, page in rnd.sample(pool, min(n, len(pool))):
+        words = rnd.sample(sorted(set(re.findall(r"[a-z0-9]+", text.lower())) - common), 3)
+        queries.append((d, page, words))
+    return queries
+
+def evaluate(label, docs, queries, target, overlap, dim, k, embed):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            conn = ingest_dir.connect(db_path)
+        doc_ids, chunk_pages, inputs = [], {}, []
+        for d, blocks in enumerate(docs):
+            chunks = ingest_dir.merge_chunks(blocks, target)
+            did = conn.execute("INSERT INTO document(title) VALUES (?)", (f"doc {d}",)).lastrowid
+            doc_ids.append(did)
+            ingest_dir.write_chunks(conn, did, f"doc {d}", "", chunks, [None] * len(chunks), False)
+            inputs.extend(ingest_dir.embedding_inputs(chunks, overlap))
+        conn.commit()
+        for r in conn.execute("SELECT chunk_id, document_id, page_start FROM chunk"):
+            chunk_pages[r[0]] = (r[1], r[2])
+        n_chunks = len(chunk_pages)
+        text_bytes = sum(len(t.encode("utf-8")) for (t,) in conn.execute("SELECT text FROM chunk"))
+        conn.execute("INSERT INTO chunk_fts(chunk_fts) VALUES('optimize')")
+        conn.commit()
+        conn.execute("VACUUM")
+        fts_bytes = sum(r[0] for r in conn.execute(
+            "SELECT SUM(LENGTH(block)) FROM chunk_fts_data UNION ALL SELECT SUM(LENGTH(sz)) FROM chunk_fts_docsize"))
+        embed_tokens = sum(ingest_dir._estimate_tokens(t) for t in inputs)
+
+        hits_bm25 = 0
+        for d, page, words in queries:
+            q = " OR ".join(f'"{w}"' for w in words)
+            rows = conn.execute("SELECT rowid FROM chunk_fts WHERE chunk_fts MATCH ? ORDER BY bm25(chunk_fts) LIMIT ?",
+                                (q, k)).fetchall()
+            hits_bm25 += (doc_ids[d], page) in {chunk_pages[r[0]] for r in rows}
+
+        hits_vec = None
+        if embed:
+            ids = list(chunk_pages)
+            mat = np.vstack([v if isinstance(v, np.ndarray) else np.zeros(dim, np.float32)
+                             for v in ingest_dir.embed_texts(inputs)])
+            qv = ingest_dir.embed_texts([" ".join(w) for _, _, w in queries])
+            hits_vec = 0
+            for (d, page, _), v in zip(queries, qv):
+                if isinstance(v, np.ndarray):
+                    top = np.argsort(-(mat @ v))[:k]
+                    hits_vec += (doc_ids[d], page) in {chunk_pages[ids[i]] for i in top}
+        conn.close()
+
+    line = (f"{label:>10s} chunks={n_chunks:7d} tok/chunk={embed_tokens / max(n_chunks, 1):6.1f} "
+            f"text={text_bytes / 1e6:7.2f}MB fts={fts_bytes / 1e6:7.2f}MB vec={n_chunks * dim * 4 / 1e6:8.2f}MB "
+            f"embed_tokens={embed_tokens:9d}")
+    if queries:
+        line += f" bm25 page-hit@{k}={hits_bm25 / len(queries):.3f}"
+        if hits_vec is not None:
+            line += f" vec page-hit@{k}={hits_vec / len(queries):.3f}"
+    print(line)
+
+def main():
+    ap = argparse.ArgumentParser(description="Index size and retrieval quality per chunk target size")
+    ap.add_argument("--root", default="", help="DOCX root to read blocks from (empty = synthetic documents)")
+    ap.add_argument("--glob", default="", help="Glob under --root (e.g. '**/*.docx')")
+    ap.add_argument("--limit", type=int, default=0, help="Read at most N DOCX files (0 = all)")
+    ap.add_argument("--docs", type=int, default=100, help="Synthetic documents (without --root)")
+    ap.add_argument("--targets", default="0,150,300,500", help="Comma-separated CHUNK_TARGET_TOKENS values")
+    ap.add_argument("--overlap", type=int, default=ingest_dir.CHUNK_OVERLAP_TOKENS, help="Embedding overlap tokens")
+    ap.add_argument("--queries", type=int, default=300, help="Sampled queries")
+    ap.add_argument("--k", type=int, default=5, help="Top-k chunks per query")
+    ap.add_argument("--dim", type=int, default=1536, help="Embedding dimension (vec size estimate)")
+    ap.add_argument("--embed", action="store_true", help="Also measure embedding retrieval (calls the API)")
+    args = ap.parse_args()
+
+    docs = docx_blocks(args.root, args.glob, args.limit) if args.root else synthetic_blocks(args.docs)
+    queries = make_queries(docs, args.queries)
+    print(f"{len(docs)} documents, {sum(len(b) for b in docs)} blocks, {len(queries)} queries")
+    for target in (int(t) for t in args.targets.split(",")):
+        label = "per-block" if target <= 0 else f"{target} tok"
+        evaluate(label, docs, queries, target, 0 if target <= 0 else args.overlap, args.dim, args.k, args.embed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ingest write throughput (chunks/second) for ingest_dir's DB writer.
+
+Runs on a fresh temporary DB with synthetic parsed documents (no DOCX parsing,
+no OpenAI calls: embeddings are random unit vectors), so only the SQLite side
+is measured:
+  1) per-row  -> the previous chunk writer: INSERT chunk, SELECT last_insert_rowid(),
+                 INSERT chunk_fts, INSERT chunk_vec for every chunk
+  2) bulk     -> ingest_dir.write_chunks (pre-assigned chunk ids, executemany per
+                 table) with FTS merges deferred to the end of the run
+  3) full     -> ingest_dir.store_parsed_docx (bulk chunks + centroids, overview,
+                 postings, company counts), FTS merges deferred
+
+Usage:
+  python bench_ingest.py --docs 200 --chunks 150 --dim 1536
+"""
+
+import os, sys, json, time, random, argparse, tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ingest_dir
+import database_manager
+
+WORDS = ("sales margin growth retail earnings guidance consumer inventory supermarket "
+         "online apparel electronics store rent wages promotion dividend outlook").split()
+
+
+def synthetic_parsed(n_docs, n_chunks, seed=0):
+    rnd = random.Random(seed)
+    docs = []
+    for d in range(n_docs):
+        chunks = [
+            (" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(20, 120))),
+             {"kind": "paragraph", "section_path": f"Section {i // 10}", "pdf_page": 1 + i // 8})
+            for i in range(n_chunks)
+        ]
+        docs.append({
+            "title": f"Synthetic report {d}",
+            "published_at": "2025-01-01",
+            "published_date": "2025-01-01",
+            "file_uri": f"file:///bench/{d}.docx",
+            "mime_type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            "meta": {"source": "bench", "absolute_path": f"/bench/{d}.docx"},
+            "chunks": chunks,
+        })
+    return docs
+
+def fake_embed(dim):
+    def embed(texts, conn=None):
+        v = np.random.rand(len(texts), dim).astype(np.float32)
+        v /= np.linalg.norm(v, axis=1, keepdims=True)
+        return list(v)
+    return embed
+
+def _insert_document(conn, parsed):
+    return conn.execute(
+        "INSERT INTO document(title, published_at, published_date, file_uri, mime_type, meta) VALUES (?,?,?,?,?,?)",
+        (parsed["title"], parsed["published_at"], parsed["published_date"], parsed["file_uri"],
+         parsed["mime_type"], "{}")
+    ).lastrowid
+
+def store_per_row(conn, parsed, compress=False):
+    """The chunk writer as it was before write_chunks."""
+    doc_id = _insert_document(conn, parsed)
+    chunks = parsed["chunks"]
+    vecs = ingest_dir.embed_texts([t for t, _ in chunks], conn)
+    for i, ((text, meta_small), vec) in enumerate(zip(chunks, vecs)):
+        pdf_page = meta_small.get("pdf_page")
+        conn.execute(
+            "INSERT INTO chunk(document_id, text, section, chunk_index, page_start, page_end, meta) "
+            "VALUES (?,?,?,?,?,?,?)",
+            (doc_id, database_manager.encode_text(text, compress), meta_small.get("section_path"), i,
+             pdf_page, pdf_page, json.dumps(meta_small, ensure_ascii=False))
+        )
+        rid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        conn.execute("INSERT INTO chunk_fts(rowid, text, section, title, doc_meta) VALUES (?,?,?,?,?)",
+                     (rid, text, meta_small.get("section_path") or "", parsed["title"], ""))
+        conn.execute("INSERT OR REPLACE INTO chunk_vec(chunk_id, dim, dtype, data) VALUES (?,?,?,?)",
+                     ingest_dir.chunk_vec_row(rid, vec))
+
+def store_bulk(conn, parsed, compress=False):
+    doc_id = _insert_document(conn, parsed)
+    chunks = parsed["chunks"]
+    vecs = ingest_dir.embed_texts([t for t, _ in chunks], conn)
+    ingest_dir.write_chunks(conn, doc_id, parsed["title"], "", chunks, vecs, compress)
+
+def run(label, docs, writer, bulk):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = ingest_dir.connect(os.path.join(tmp, "bench.db"))
+        try:
+            n_chunks = sum(len(d["chunks"]) for d in docs)
+            t0 = time.perf_counter()
+            if bulk:
+                ingest_dir.fts_defer_merges(conn)
+            for d in docs:
+                writer(conn, d)
+                conn.commit()
+            if bulk:
+                ingest_dir.fts_finish_merges(conn)
+            dt = time.perf_counter() - t0
+            print(f"{label:8s} {n_chunks} chunks in {dt:.2f}s -> {n_chunks / dt:,.0f} chunks/s")
+        finally:
+            conn.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure ingest DB write throughput (per-row vs bulk)")
+    ap.add_argument("--docs", type=int, default=200, help="Synthetic documents")
+    ap.add_argument("--chunks", type=int, default=150, help="Chunks per document")
+    ap.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    args = ap.parse_args()
+
+    ingest_dir.embed_texts = fake_embed(args.dim)
+    docs = synthetic_parsed(args.docs, args.chunks)
+    run("per-row", docs, store_per_row, bulk=False)
+    run("bulk", docs, store_bulk, bulk=True)
+    run("full", docs, lambda conn, d: ingest_dir.store_parsed_docx(conn, d), bulk=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Before/after numbers for compressed chunk text + document meta (ingest_dir --compress).
+
+Works on a temporary COPY of the DB (the original is never touched):
+  1) plain copy      -> decompress everything, VACUUM, measure
+  2) compressed copy -> compress everything,   VACUUM, measure
+
+Reported per copy:
+  - db_bytes         : file size after VACUUM
+  - chunk/doc pages  : bytes of b-tree pages for chunk + document (dbstat),
+                       i.e. the page cache needed to keep them hot
+  - fetch ms         : median time of database_manager.fetch_chunks_for_documents
+                       and get_context_chunks_for_sources over a sample of documents
+                       (warm OS cache; first run discarded)
+
+Usage:
+  python bench_text_storage.py --db Backend/pdfint.db --sample 50 --repeat 5
+"""
+
+import os, sys, time, shutil, random, argparse, tempfile, statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Backend"))
+import database_manager
+
+
+def table_bytes(conn, names):
+    try:
+        rows = conn.execute(
+            f"SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({','.join('?' * len(names))}) GROUP BY name",
+            names,
+        ).fetchall()
+        return {r[0]: int(r[1]) for r in rows}
+    except Exception:
+        return {}
+
+def time_ms(fn, repeat):
+    fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def measure(path, doc_ids, repeat):
+    conn = database_manager.db(path)
+    try:
+        sources = [
+            {"document_id": d, "pages": sorted(p for (p,) in conn.execute(
+                "SELECT DISTINCT page_start FROM chunk WHERE document_id=? AND page_start IS NOT NULL", (d,)))}
+            for d in doc_ids[:5]
+        ]
+        tb = table_bytes(conn, ["chunk", "document"])
+        return {
+            "db_bytes": os.path.getsize(path),
+            "chunk_page_bytes": tb.get("chunk"),
+            "document_page_bytes": tb.get("document"),
+            "fetch_chunks_ms": time_ms(lambda: database_manager.fetch_chunks_for_documents(conn, doc_ids), repeat),
+            "context_5_sources_ms": time_ms(lambda: database_manager.get_context_chunks_for_sources(conn, sources), repeat),
+        }
+    finally:
+        conn.close()
+
+def prepare_copy(src, dst, compress):
+    shutil.copyfile(src, dst)
+    conn = database_manager.db(dst)
+    try:
+        conn.execute("PRAGMA journal_mode=DELETE;")
+        database_manager.reencode_stored_text(conn, compress=compress)
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure compressed vs plain chunk text storage on a DB copy")
+    ap.add_argument("--db", required=True, help="SQLite path for main DB (read only; a copy is measured)")
+    ap.add_argument("--sample", type=int, default=50, help="Documents per fetch")
+    ap.add_argument("--repeat", type=int, default=5, help="Timed repetitions per fetch")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "plain.db")
+        packed = os.path.join(tmp, "compressed.db")
+        prepare_copy(args.db, plain, compress=False)
+        prepare_copy(args.db, packed, compress=True)
+
+        conn = database_manager.db(plain)
+        all_ids = [r[0] for r in conn.execute("SELECT document_id FROM document")]
+        conn.close()
+        random.seed(0)
+        doc_ids = random.sample(all_ids, min(args.sample, len(all_ids)))
+
+        before = measure(plain, doc_ids, args.repeat)
+        after = measure(packed, doc_ids, args.repeat)
+
+    print(f"{'metric':<24}{'plain':>16}{'compressed':>16}{'ratio':>10}")
+    for k in before:
+        b, a = before[k], after[k]
+        ratio = f"{a / b:.2f}" if b and a is not None else "-"
+        fmt = (lambda v: f"{v:,.2f}") if isinstance(b, float) else (lambda v: f"{v:,}" if v is not None else "-")
+        print(f"{k:<24}{fmt(b):>16}{fmt(a):>16}{ratio:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,18 @@ One-shot setup + resilient migration:
 - De-dupes offending rows before creating UNIQUE indexes
 - Seeds ref_company (ticker->name) and ref_company_alias (slang)
 - Rebuilds company_term_count with name/ticker/alias hits
+  (--changed-only / --company: recount only companies whose name/aliases changed,
+   or the given tickers; new documents are counted by ingest_dir itself)
 """
 
-import os, re, sys, datetime, sqlite3
+import os, sys, json, argparse, datetime, sqlite3
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from typing import Dict, List, Tuple, Optional
 
+# Backend modules shared with the API (storage codec, ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Backend"))
+import database_manager
+
 DEFAULT_DB = r"C:\Users\HarryKember\OneDrive - MST Financial\Desktop\20251029 AI Reports\V6\Backend\pdfint.db"
 DB_PATH =  DEFAULT_DB
 
@@ -66,15 +73,8 @@ ALIASES: Dict[str, List[str]] = {
     "WOW": ["Woolworths", "Woolies", "Woolworths Group"],
 }
 
-WORD_BOUNDARY = r"(?<![A-Za-z0-9]){term}(?![A-Za-z0-9])"
-
 # ----------------- small utils -----------------
 
-def safe_regex_count(pattern: Optional[str], text: str) -> int:
-    if not pattern or not text: return 0
-    try: return len(re.findall(pattern, text, flags=re.I))
-    except re.error: return 0
-
 def fetchone(conn, sql, params=()):
     cur = conn.execute(sql, params); r = cur.fetchone(); cur.close(); return r
 
@@ -163,18 +163,25 @@ def ensure_company_term_count(conn: sqlite3.Connection):
 
 def seed_ref_company(conn: sqlite3.Connection):
     ensure_ref_company(conn)
+    changed = set()
     for tkr, name in ASX_COMPANIES.items():
-        conn.execute("""
+        row = fetchone(conn, "SELECT company_id, legal_name FROM ref_company WHERE UPPER(ticker)=UPPER(?)", (tkr,))
+        if row and row["legal_name"] == name:
+            continue
+        cur = conn.execute("""
             INSERT INTO ref_company(legal_name, ticker)
             VALUES(?, ?)
             ON CONFLICT(UPPER(ticker)) DO UPDATE SET legal_name=excluded.legal_name
         """, (name, tkr))
+        changed.add(row["company_id"] if row else cur.lastrowid)
     conn.commit()
     n = fetchone(conn, "SELECT COUNT(*) FROM ref_company")[0]
-    print(f"[seed] ref_company rows now: {n}")
+    print(f"[seed] ref_company rows now: {n} ({len(changed)} new/renamed)")
+    return changed
 
 def seed_aliases(conn: sqlite3.Connection):
     ensure_ref_company_alias(conn)
+    changed = set()
     for tkr, alias_list in ALIASES.items():
         row = fetchone(conn, "SELECT company_id FROM ref_company WHERE UPPER(ticker)=UPPER(?)", (tkr,))
         if not row:
@@ -182,14 +189,17 @@ def seed_aliases(conn: sqlite3.Connection):
             continue
         cid = row[0]
         for a in alias_list:
-            conn.execute("""
+            cur = conn.execute("""
                 INSERT INTO ref_company_alias(company_id, alias)
                 VALUES(?, ?)
                 ON CONFLICT(company_id, UPPER(alias)) DO NOTHING
             """, (cid, a))
+            if cur.rowcount > 0:
+                changed.add(cid)
     conn.commit()
     n = fetchone(conn, "SELECT COUNT(*) FROM ref_company_alias")[0]
-    print(f"[alias] ref_company_alias rows now: {n}")
+    print(f"[alias] ref_company_alias rows now: {n} ({len(changed)} companies with new aliases)")
+    return changed
 
 # ----------------- counting -----------------
 
@@ -206,19 +216,8 @@ def summarize_counts(conn: sqlite3.Connection):
     }
 
 def upsert_counts(conn: sqlite3.Connection, rows: List[Tuple]) -> int:
-    if not rows: return 0
-    # This ON CONFLICT now matches ux_ctc_doc_company unique index
-    conn.executemany("""
-        INSERT INTO company_term_count(document_id, company_id, name_hits, ticker_hits, alias_hits, total_hits, last_scanned_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(document_id, company_id) DO UPDATE SET
-          name_hits       = excluded.name_hits,
-          ticker_hits     = excluded.ticker_hits,
-          alias_hits      = excluded.alias_hits,
-          total_hits      = excluded.total_hits,
-          last_scanned_at = excluded.last_scanned_at
-    """, rows)
-    return len(rows)
+    # ON CONFLICT matches the ux_ctc_doc_company unique index
+    return database_manager.upsert_company_term_counts(conn, rows)
 
 def rebuild_counts(conn: sqlite3.Connection):
     counts = summarize_counts(conn)
@@ -234,72 +233,40 @@ def rebuild_counts(conn: sqlite3.Connection):
         part = doc_ids[i:i+BATCH]
         q = "SELECT document_id, text FROM chunk WHERE document_id IN ({})".format(",".join("?"*len(part)))
         for row in fetchall(conn, q, tuple(part)):
-            chunks_by_doc.setdefault(row["document_id"], []).append(row["text"] or "")
-
-    # Prefetch companies & aliases
-    companies = fetchall(conn, "SELECT company_id, legal_name, COALESCE(ticker,'') AS ticker FROM ref_company")
-    alias_map = {}
-    if counts.get("ref_company_alias"):
-        for row in fetchall(conn, "SELECT company_id, alias FROM ref_company_alias"):
-            alias_map.setdefault(row["company_id"], []).append((row["alias"] or "").strip())
+            chunks_by_doc.setdefault(row["document_id"], []).append(database_manager.decode_text(row["text"]) or "")
 
     now = datetime.datetime.utcnow().isoformat()
 
+    # Every company's name/ticker/aliases in one matcher: one pass per document
+    matcher = database_manager.load_company_matcher(conn)
+
     # FAST PATH via document_company
     if counts.get("document_company"):
         print("[ctc] Using document_company links.")
         links = fetchall(conn, """
-            SELECT dc.document_id, dc.company_id, rc.legal_name AS name, COALESCE(rc.ticker,'') AS ticker
+            SELECT dc.document_id, dc.company_id
             FROM document_company dc
             JOIN ref_company rc ON rc.company_id = dc.company_id
         """)
-        to_upsert = []
+        linked = {}
         for row in links:
-            did, cid = row["document_id"], row["company_id"]
-            name, ticker = (row["name"] or "").strip(), (row["ticker"] or "").strip()
+            linked.setdefault(row["document_id"], []).append(row["company_id"])
+        to_upsert = []
+        for did, cids in linked.items():
             low = (" \n".join(chunks_by_doc.get(did, []))).lower()
-            nh = safe_regex_count(WORD_BOUNDARY.format(term=re.escape(name.lower())), low) if name else 0
-            th = safe_regex_count(WORD_BOUNDARY.format(term=re.escape(ticker.lower())), low) if ticker else 0
-            ah = 0
-            for al in alias_map.get(cid, []):
-                if al: ah += safe_regex_count(WORD_BOUNDARY.format(term=re.escape(al.lower())), low)
-            tot = nh + th + ah
-            to_upsert.append((did, cid, nh, th, ah, tot, now))
+            to_upsert.extend(database_manager.company_term_rows(matcher, did, low, now, cids))
         n = upsert_counts(conn, to_upsert); conn.commit()
         print(f"[ctc] Upserted {n} rows (document_company).")
         return
 
     # FALLBACK: global scan
     print("[ctc] document_company empty → global scan (name/ticker/aliases).")
-    # Precompile patterns
-    comp_specs: List[Tuple[int, Optional[str], Optional[str], List[str]]] = []
-    for c in companies:
-        cid = c["company_id"]
-        name = (c["legal_name"] or "").strip()
-        ticker = (c["ticker"] or "").strip()
-        pat_name   = WORD_BOUNDARY.format(term=re.escape(name.lower())) if name else None
-        pat_ticker = WORD_BOUNDARY.format(term=re.escape(ticker.lower())) if ticker else None
-        pat_aliases = []
-        for al in alias_map.get(cid, []):
-            al = (al or "").strip()
-            if al: pat_aliases.append(WORD_BOUNDARY.format(term=re.escape(al.lower())))
-        comp_specs.append((cid, pat_name, pat_ticker, pat_aliases))
-
     total_upserts = 0
     processed_docs = 0
     for did in doc_ids:
         processed_docs += 1
         low = (" \n".join(chunks_by_doc.get(did, []))).lower()
-        to_upsert = []
-        for cid, pat_name, pat_ticker, pat_aliases in comp_specs:
-            nh = safe_regex_count(pat_name, low) if pat_name else 0
-            th = safe_regex_count(pat_ticker, low) if pat_ticker else 0
-            ah = 0
-            for pa in pat_aliases: ah += safe_regex_count(pa, low)
-            tot = nh + th + ah
-            if tot > 0:
-                to_upsert.append((did, cid, nh, th, ah, tot, now))
-        total_upserts += upsert_counts(conn, to_upsert)
+        total_upserts += upsert_counts(conn, database_manager.company_term_rows(matcher, did, low, now))
         if processed_docs % 100 == 0:
             conn.commit()
             print(f"[ctc] ... processed {processed_docs}/{len(doc_ids)} docs; {total_upserts} rows upserted")
@@ -307,11 +274,105 @@ def rebuild_counts(conn: sqlite3.Connection):
     conn.commit()
     print(f"[ctc] Upserted {total_upserts} rows (global scan).")
 
+# ----------------- parallel rebuild -----------------
+
+# per-worker state (own read connection + compiled matcher), set by _init_worker
+_WORKER = {}
+
+def _init_worker(db_path: str):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    _WORKER["conn"] = conn
+    _WORKER["matcher"] = database_manager.load_company_matcher(conn)
+
+def _count_batch(doc_ids: List[int], linked: Optional[Dict[int, List[int]]], now: str) -> Tuple[int, List[Tuple]]:
+    conn, matcher = _WORKER["conn"], _WORKER["matcher"]
+    texts = {}
+    for row in fetchall(conn, "SELECT document_id, text FROM chunk WHERE document_id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(doc_ids),)):
+        texts.setdefault(row["document_id"], []).append(database_manager.decode_text(row["text"]) or "")
+    rows = []
+    for did in doc_ids:
+        low = (" \n".join(texts.get(did, []))).lower()
+        rows.extend(database_manager.company_term_rows(matcher, did, low, now, linked.get(did) if linked is not None else None))
+    return len(doc_ids), rows
+
+def rebuild_counts_parallel(conn: sqlite3.Connection, db_path: str, workers: int, batch: int = 50):
+    """
+    Same result as rebuild_counts, but documents are streamed in batches of
+    `batch` to `workers` processes (each counting every company); this process
+    is the only writer. At most 2*workers batches are in flight, so memory
+    stays bounded whatever the corpus size.
+    """
+    counts = summarize_counts(conn)
+    print(f"[setup] Row counts: {counts}")
+    if not counts.get("document"):
+        print("[setup] No documents found. Exiting."); return
+
+    now = datetime.datetime.utcnow().isoformat()
+    linked = None
+    if counts.get("document_company"):
+        print("[ctc] Using document_company links.")
+        linked = {}
+        for row in fetchall(conn, """
+            SELECT dc.document_id, dc.company_id
+            FROM document_company dc
+            JOIN ref_company rc ON rc.company_id = dc.company_id
+        """):
+            linked.setdefault(row["document_id"], []).append(row["company_id"])
+        doc_ids = list(linked)
+    else:
+        print("[ctc] document_company empty → global scan (name/ticker/aliases).")
+        doc_ids = [r["document_id"] for r in fetchall(conn, "SELECT document_id FROM document")]
+
+    batches = iter([doc_ids[i:i+batch] for i in range(0, len(doc_ids), batch)])
+    processed_docs = total_upserts = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path,)) as ex:
+        pending = set()
+        while True:
+            while len(pending) < 2 * workers:
+                part = next(batches, None)
+                if part is None:
+                    break
+                part_links = {d: linked[d] for d in part} if linked is not None else None
+                pending.add(ex.submit(_count_batch, part, part_links, now))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                n_docs, rows = fut.result()
+                total_upserts += upsert_counts(conn, rows)
+                conn.commit()
+                processed_docs += n_docs
+                print(f"[ctc] ... processed {processed_docs}/{len(doc_ids)} docs; {total_upserts} rows upserted")
+
+    print(f"[ctc] Upserted {total_upserts} rows ({workers} workers).")
+
+def recount_companies(conn: sqlite3.Connection, company_ids):
+    """Targeted recount: only the given companies, across the whole corpus."""
+    total = 0
+    for cid in sorted(company_ids):
+        total += database_manager.recount_company(conn, cid)
+        conn.commit()
+    print(f"[ctc] Recounted {len(company_ids)} companies; {total} rows written.")
+
 # ----------------- main -----------------
 
 def main():
-    print(f"[setup] Opening DB: {DB_PATH}")
-    conn = sqlite3.connect(DB_PATH)
+    ap = argparse.ArgumentParser(description="Seed ref_company/aliases and (re)build company_term_count")
+    ap.add_argument("--db", default=DB_PATH, help="SQLite path for main DB")
+    ap.add_argument("--changed-only", action="store_true", help="Only recount companies whose name/aliases changed while seeding")
+    ap.add_argument("--company", nargs="+", default=[], metavar="TICKER", help="Only recount these tickers")
+    ap.add_argument("--workers", type=int, default=0, help="Full rebuild across N worker processes (0 = in-process)")
+    ap.add_argument("--list-dynamic", action="store_true", help="Only list off-book companies persisted at query time")
+    ap.add_argument("--purge-dynamic", nargs="*", type=int, default=None, metavar="COMPANY_ID",
+                    help="Only delete off-book companies persisted at query time (these ids, or all)")
+    ap.add_argument("--older-than", type=float, default=None, metavar="DAYS",
+                    help="With --purge-dynamic: only companies not updated for DAYS days")
+    args = ap.parse_args()
+
+    print(f"[setup] Opening DB: {args.db}")
+    conn = sqlite3.connect(args.db)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA foreign_keys=ON;")
@@ -321,12 +382,38 @@ def main():
     ensure_ref_company_alias(conn)
     ensure_company_term_count(conn)
 
-    # 2) Seed
-    seed_ref_company(conn)
-    seed_aliases(conn)
+    if args.list_dynamic:
+        for c in database_manager.list_dynamic_companies(conn):
+            print(f"[dynamic] {c['company_id']} {c['legal_name']!r} source={c['source']} updated={c['updated_at']} "
+                  f"docs={c['documents']} aliases={c['aliases']} query={c['query']!r}")
+        conn.close()
+        return
+    if args.purge_dynamic is not None:
+        n = database_manager.purge_dynamic_companies(conn, args.purge_dynamic or None, args.older_than)
+        conn.commit()
+        print(f"[dynamic] purged {n} off-book companies.")
+        conn.close()
+        return
 
-    # 3) Rebuild counts
-    rebuild_counts(conn)
+    # 2) Seed
+    changed = seed_ref_company(conn) | seed_aliases(conn)
+
+    # 3) Rebuild counts (full, or only the affected companies)
+    if args.company:
+        ids = set()
+        for t in args.company:
+            cid = database_manager.get_company_id_for_ticker(conn, t)
+            if cid is None:
+                print(f"[ctc] WARN: ticker {t} not found; skipping")
+            else:
+                ids.add(cid)
+        recount_companies(conn, ids)
+    elif args.changed_only:
+        recount_companies(conn, changed)
+    elif args.workers > 1:
+        rebuild_counts_parallel(conn, args.db, args.workers)
+    else:
+        rebuild_counts(conn)
 
     conn.close()
 
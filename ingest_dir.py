@@ -14,11 +14,15 @@ ingest_docx_tree.py — DOCX-first, tree-aware ingestor for pdfint.db
 - Saves inline images to OUT_DIR
 - Embeds chunks (OpenAI) with fail-open handling
 - Builds FTS
+- Incremental: ingest_manifest (path, size, mtime, sha256 -> document_id) skips
+  unchanged files and replaces changed ones in place
 """
 
-import os, re, json, argparse, sqlite3, datetime, glob, uuid
+import os, re, sys, json, time, argparse, sqlite3, datetime, glob, hashlib, zipfile, posixpath, struct, threading
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple, Any
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, Any, Iterator
 from io import BytesIO
 
 import numpy as np
@@ -32,15 +36,28 @@ from docx.table import Table as _Table
 from docx.oxml.table import CT_Tbl
 from docx.oxml.text.paragraph import CT_P
 from docx.oxml.ns import qn
+from lxml import etree
 
 # ---- OpenAI (embedding) ----
 from openai import OpenAI
 
+# ---- Backend modules shared with the API (storage codec, ...) ----
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Backend"))
+import database_manager
+import term_index
+import company_matcher
+
 # ---------- Config (env overridable) ----------
 DEFAULT_DB = os.getenv("MAIN_DB_PATH",
     r"pdfint.db"
 )
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+# Embedding requests: inputs per request, estimated tokens per request (~4 chars/token),
+# requests in flight, and attempts per batch before it is split / given up
+EMBED_BATCH_SIZE   = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+EMBED_CONCURRENCY  = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_RETRIES      = int(os.getenv("EMBED_RETRIES", "3"))
 
 # Read from the DEBUG-inserted copies (these contain the blank page marker pages):
 SOURCE_ROOT = os.getenv("SOURCE_ROOT",
@@ -55,6 +72,22 @@ OUT_DIR   = os.getenv("OUT_DIR",
     r"out_docx_tree"
 )
 
+# Store chunk.text / document.meta zlib-compressed (read back transparently by database_manager)
+COMPRESS_TEXT = os.getenv("COMPRESS_TEXT", "0") == "1"
+
+# Document trees go into document_tree_section (per-section, compressed); set to also
+# write <stem>_tree.json (compact) under the output dir for external tools
+WRITE_TREE_JSON = os.getenv("WRITE_TREE_JSON", "0") == "1"
+
+# Chunking: adjacent paragraphs / table cells with the same page label and section are
+# merged up to ~CHUNK_TARGET_TOKENS (0 = one chunk per block); each chunk's embedding input
+# is prefixed with ~CHUNK_OVERLAP_TOKENS of the previous chunk on the same page/section
+CHUNK_TARGET_TOKENS  = int(os.getenv("CHUNK_TARGET_TOKENS", "300"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+# Read DOCX with the one-pass lxml reader (python-docx only as a fallback)
+DOCX_STREAMING = os.getenv("DOCX_STREAMING", "1") == "1"
+
 client = OpenAI()  # requires OPENAI_API_KEY
 
 # ---------- DB schema ----------
@@ -72,6 +105,7 @@ CREATE TABLE IF NOT EXISTS document (
   document_id  INTEGER PRIMARY KEY,
   title        TEXT,
   published_at TEXT,
+  published_date TEXT,
   file_uri     TEXT,
   mime_type    TEXT,
   meta         TEXT
@@ -91,8 +125,7 @@ CREATE TABLE IF NOT EXISTS chunk (
   chunk_index  INTEGER,
   page_start   INTEGER,
   page_end     INTEGER,
-  meta         TEXT,
-  embedding    BLOB
+  meta         TEXT
 );
 
 CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(
@@ -115,41 +148,411 @@ def connect(db_path: str) -> sqlite3.Connection:
     db_exists = os.path.exists(db_path)
     conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    database_manager.register_codec(conn)
     if not db_exists:
         conn.executescript(MAIN_SCHEMA_SQL); conn.commit()
+    ensure_schema_upgrades(conn)
     return conn
 
-def ensure_company_links(conn: sqlite3.Connection, document_id: int, text_for_detect: str):
-    tickers = set(re.findall(r"\b[A-Z]{3,4}\b", text_for_detect or ""))
-    if not tickers:
-        return
-    if not conn.execute("SELECT COUNT(*) AS c FROM ref_company").fetchone()["c"]:
-        return
-    for t in tickers:
-        row = conn.execute("SELECT company_id FROM ref_company WHERE UPPER(ticker)=?", (t.upper(),)).fetchone()
-        if row:
-            try:
-                conn.execute(
-                    "INSERT OR IGNORE INTO document_company(document_id, company_id) VALUES (?,?)",
-                    (document_id, row["company_id"])
-                )
-            except Exception:
-                pass
+def ensure_schema_upgrades(conn: sqlite3.Connection):
+    """Idempotent additions for DBs created by older versions of this script."""
+    # Per-document chunk fetches (backend context + company scans) filter on document_id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_document ON chunk(document_id, page_start, chunk_index)")
+
+    # Normalised YYYY-MM-DD date taken from the file path (read by the backend ranking)
+    doc_cols = {r[1] for r in conn.execute("PRAGMA table_info(document)")}
+    if "published_date" not in doc_cols:
+        conn.execute("ALTER TABLE document ADD COLUMN published_date TEXT")
+        backfill_published_dates(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_document_published_date ON document(published_date)")
+
+    # Pre-joined page-1 (overview) text, one keyed row per document
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS document_overview (
+          document_id  INTEGER PRIMARY KEY REFERENCES document(document_id) ON DELETE CASCADE,
+          page1_text   TEXT,
+          n_chunks     INTEGER,
+          updated_at   TEXT
+        )
+    """)
+    # Earlier versions also embedded page 1; nothing read that vector
+    if "embedding" in {r[1] for r in conn.execute("PRAGMA table_info(document_overview)")}:
+        try:
+            conn.execute("ALTER TABLE document_overview DROP COLUMN embedding")
+        except sqlite3.OperationalError as e:
+            print(f"[migrate] cannot drop document_overview.embedding ({e}); clearing it instead.")
+            conn.execute("UPDATE document_overview SET embedding = NULL WHERE embedding IS NOT NULL")
+
+    # Chunk embeddings live outside the chunk row so text scans don't page through vectors
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chunk_vec (
+          chunk_id     INTEGER PRIMARY KEY REFERENCES chunk(chunk_id) ON DELETE CASCADE,
+          dim          INTEGER NOT NULL,
+          dtype        TEXT NOT NULL,
+          data         BLOB NOT NULL
+        )
+    """)
+
+    # Centroid (mean, re-normalised) chunk embeddings per document and per page, float16
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS document_vec (
+          document_id  INTEGER PRIMARY KEY REFERENCES document(document_id) ON DELETE CASCADE,
+          n_chunks     INTEGER NOT NULL,
+          dim          INTEGER NOT NULL,
+          dtype        TEXT NOT NULL,
+          data         BLOB NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS page_vec (
+          document_id  INTEGER NOT NULL REFERENCES document(document_id) ON DELETE CASCADE,
+          page         INTEGER NOT NULL,
+          n_chunks     INTEGER NOT NULL,
+          dim          INTEGER NOT NULL,
+          dtype        TEXT NOT NULL,
+          data         BLOB NOT NULL,
+          PRIMARY KEY (document_id, page)
+        ) WITHOUT ROWID
+    """)
+
+    # Positional token postings (term -> document, tf, delta-encoded uint32 positions);
+    # term_doc maps positions back to pages via each chunk's first position
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS term_vocab (
+          term_id      INTEGER PRIMARY KEY,
+          term         TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS term_posting (
+          term_id      INTEGER NOT NULL REFERENCES term_vocab(term_id),
+          document_id  INTEGER NOT NULL REFERENCES document(document_id) ON DELETE CASCADE,
+          tf           INTEGER NOT NULL,
+          positions    BLOB NOT NULL,
+          PRIMARY KEY (term_id, document_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_term_posting_document ON term_posting(document_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS term_doc (
+          document_id  INTEGER PRIMARY KEY REFERENCES document(document_id) ON DELETE CASCADE,
+          n_tokens     INTEGER NOT NULL,
+          chunk_starts BLOB NOT NULL,
+          chunk_pages  BLOB NOT NULL
+        )
+    """)
+
+    # Embeddings keyed by sha1(normalised text) + model: repeated boilerplate and
+    # re-ingested chunks are never sent to the API twice
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+          text_sha1    TEXT NOT NULL,
+          model        TEXT NOT NULL,
+          dim          INTEGER NOT NULL,
+          dtype        TEXT NOT NULL,
+          data         BLOB NOT NULL,
+          PRIMARY KEY (text_sha1, model)
+        ) WITHOUT ROWID
+    """)
+
+    # Content-addressed media store: one row per stored blob (out/media/<sha[:2]>/<sha><ext>)
+    # and one per (blob, document) using it; media_refcount is what --gc-media collects on
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_blob (
+          sha256       TEXT PRIMARY KEY,
+          file         TEXT NOT NULL,
+          content_type TEXT,
+          size_bytes   INTEGER,
+          width_px     INTEGER,
+          height_px    INTEGER,
+          created_at   TEXT
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_ref (
+          sha256       TEXT NOT NULL REFERENCES media_blob(sha256),
+          document_id  INTEGER NOT NULL REFERENCES document(document_id) ON DELETE CASCADE,
+          uses         INTEGER NOT NULL,
+          PRIMARY KEY (sha256, document_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_media_ref_document ON media_ref(document_id)")
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS media_refcount AS
+        SELECT b.sha256, b.file, b.size_bytes, COUNT(r.document_id) AS ref_count
+        FROM media_blob b LEFT JOIN media_ref r ON r.sha256 = b.sha256
+        GROUP BY b.sha256
+    """)
+
+    # DOCX tree per section (database_manager.tree_section_rows): outline + lazily read blocks
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS document_tree_section (
+          document_id  INTEGER NOT NULL REFERENCES document(document_id) ON DELETE CASCADE,
+          section      INTEGER NOT NULL,
+          parent       INTEGER,
+          level        INTEGER,
+          title        TEXT,
+          data         BLOB,
+          PRIMARY KEY (document_id, section)
+        ) WITHOUT ROWID
+    """)
+
+    # Bumped with every committed document change; the API reads it to know the corpus moved on
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS corpus_generation (
+          id           INTEGER PRIMARY KEY CHECK (id = 1),
+          generation   INTEGER NOT NULL,
+          updated_at   TEXT
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO corpus_generation(id, generation, updated_at) VALUES (1, 0, NULL)")
+
+    # Ingest runs and per-file checkpoints (committed with each file's document) for --resume
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_run (
+          run_id       INTEGER PRIMARY KEY,
+          started_at   TEXT,
+          finished_at  TEXT,
+          status       TEXT NOT NULL,
+          root         TEXT,
+          glob         TEXT,
+          out_dir      TEXT,
+          n_files      INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_run_file (
+          run_id          INTEGER NOT NULL REFERENCES ingest_run(run_id),
+          path            TEXT NOT NULL,
+          status          TEXT NOT NULL,
+          document_id     INTEGER,
+          missing_vectors INTEGER,
+          error           TEXT,
+          updated_at      TEXT,
+          PRIMARY KEY (run_id, path)
+        ) WITHOUT ROWID
+    """)
+
+    # Which file each document came from, so re-runs skip unchanged files
+    have_manifest = "ingest_manifest" in {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+          path         TEXT PRIMARY KEY,
+          size         INTEGER NOT NULL,
+          mtime        REAL NOT NULL,
+          sha256       TEXT NOT NULL,
+          document_id  INTEGER,
+          ingested_at  TEXT
+        )
+    """)
+    conn.commit()
+    if not have_manifest:
+        seed_manifest_from_documents(conn)
+
+def load_company_links(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """
+    Everything document linking needs from ref_company, read once per ingest run:
+      - "tickers": {UPPER(ticker): [company_id, ...]}
+      - "matcher": company_matcher over names, tickers and ref_company_alias
+        (the same one the company_term_count update uses)
+    """
+    tickers: Dict[str, List[int]] = {}
+    for r in conn.execute("SELECT company_id, UPPER(TRIM(ticker)) AS t FROM ref_company WHERE COALESCE(TRIM(ticker),'') <> ''"):
+        tickers.setdefault(r["t"], []).append(int(r["company_id"]))
+    return {"tickers": tickers, "matcher": database_manager.load_company_matcher(conn)}
+
+def ensure_company_links(conn: sqlite3.Connection, document_id: int, text_for_detect: str,
+                         companies: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Link a document to every company it mentions: an upper-case 3-4 letter token
+    equal to a ticker (case matters, so "wow" in prose is not WOW), or a legal
+    name / alias at a word boundary. Computed in memory; one executemany.
+    Returns links written.
+    """
+    if companies is None:
+        companies = load_company_links(conn)
+    text = text_for_detect or ""
+    ids = set()
+    for t in set(re.findall(r"\b[A-Z]{3,4}\b", text)):
+        ids.update(companies["tickers"].get(t, ()))
+    for cid, h in company_matcher.count_hits(companies["matcher"], text.lower()).items():
+        if h["name_hits"] or h["alias_hits"]:
+            ids.add(cid)
+    if ids:
+        conn.executemany("INSERT OR IGNORE INTO document_company(document_id, company_id) VALUES (?,?)",
+                         [(document_id, cid) for cid in sorted(ids)])
+    return len(ids)
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def embedding_batches(texts: List[str]) -> List[List[int]]:
+    """Pack indexes of non-empty texts into batches capped by count and estimated tokens."""
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, t in enumerate(texts):
+        if not t:
+            continue  # the API rejects empty inputs
+        n = _estimate_tokens(t)
+        if cur and (len(cur) >= EMBED_BATCH_SIZE or cur_tokens + n > EMBED_BATCH_TOKENS):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+# Requests in flight across every caller (pipeline embed stage included)
+_EMBED_SLOTS = threading.BoundedSemaphore(max(1, EMBED_CONCURRENCY))
+
+def _embed_batch(texts: List[str]) -> List[Optional[np.ndarray]]:
+    """One batch with retries (exponential backoff); a batch rejected as bad input (4xx) is split in half."""
+    err: Optional[Exception] = None
+    for attempt in range(max(1, EMBED_RETRIES)):
+        try:
+            with _EMBED_SLOTS:
+                resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
+            out: List[Optional[np.ndarray]] = []
+            for d in resp.data:
+                v = np.asarray(d.embedding, dtype=np.float32)
+                v = v / (np.linalg.norm(v) + 1e-9)
+                out.append(v.astype(np.float32))
+            return out
+        except Exception as e:
+            err = e
+            if attempt + 1 < max(1, EMBED_RETRIES):
+                time.sleep(2 ** attempt)
+    # 400-class errors point at an input (too long, bad text): isolate it by halving.
+    # Anything else (rate limit, outage) gives up on this batch; --backfill-embeddings retries later.
+    status = getattr(err, "status_code", None) or 0
+    if len(texts) > 1 and 400 <= status < 500 and status != 429:
+        mid = len(texts) // 2
+        return _embed_batch(texts[:mid]) + _embed_batch(texts[mid:])
+    print(f"[embed] WARNING: embedding failed for {len(texts)} texts; continuing without vectors: {err}")
+    return [None for _ in texts]
+
+# embedding_cache hits/misses for this run (printed at the end of an ingest)
+EMBED_CACHE_STATS = {"hits": 0, "misses": 0}
+_EMBED_STATS_LOCK = threading.Lock()
+
+def embed_cache_key(text: str) -> str:
+    return hashlib.sha1(re.sub(r"\s+", " ", text or "").strip().encode("utf-8")).hexdigest()
+
+def _embed_uncached(texts: List[str]) -> List[Optional[np.ndarray]]:
+    out: List[Optional[np.ndarray]] = [None for _ in texts]
+    batches = embedding_batches(texts)
+    if not batches:
+        return out
+    with ThreadPoolExecutor(max_workers=max(1, min(EMBED_CONCURRENCY, len(batches)))) as ex:
+        results = ex.map(lambda idx: _embed_batch([texts[i] for i in idx]), batches)
+        for idx, vecs in zip(batches, results):
+            for i, v in zip(idx, vecs):
+                out[i] = v
+    return out
 
-def embed_texts(texts: List[str]) -> List[Optional[np.ndarray]]:
+def embed_texts(texts: List[str], conn: Optional[sqlite3.Connection] = None) -> List[Optional[np.ndarray]]:
+    """
+    Embed texts in size-capped batches, EMBED_CONCURRENCY requests at a time.
+    Fail-open per batch: inputs that still fail (and empty texts) get None,
+    to be filled in later by --backfill-embeddings.
+
+    With a connection, embedding_cache is consulted first and new vectors are
+    added to it (in the caller's transaction); identical texts in one call
+    are embedded once.
+    """
     if not texts:
         return []
-    try:
-        resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
-        out: List[Optional[np.ndarray]] = []
-        for d in resp.data:
-            v = np.asarray(d.embedding, dtype=np.float32)
-            v = v / (np.linalg.norm(v) + 1e-9)
-            out.append(v.astype(np.float32))
-        return out
-    except Exception as e:
-        print(f"[embed] WARNING: embedding failed; continuing without vectors: {e}")
-        return [None for _ in texts]
+    if conn is None:
+        return _embed_uncached(texts)
+    vecs, rows = embed_texts_cached(texts, conn)
+    store_embed_cache_rows(conn, rows)
+    return vecs
+
+def store_embed_cache_rows(conn: sqlite3.Connection, rows: List[Tuple[str, str, int, str, bytes]]):
+    conn.executemany(
+        "INSERT OR IGNORE INTO embedding_cache(text_sha1, model, dim, dtype, data) VALUES (?,?,?,?,?)", rows
+    )
+
+def embed_texts_cached(texts: List[str], conn: sqlite3.Connection
+                       ) -> Tuple[List[Optional[np.ndarray]], List[Tuple[str, str, int, str, bytes]]]:
+    """
+    embed_texts through embedding_cache without writing to it: returns the
+    vectors and the new cache rows, so a reader connection (the pipeline's
+    embed stage) can do the lookups and leave the INSERT to the writer.
+    """
+    keys = [embed_cache_key(t) if t else None for t in texts]
+    cached: Dict[str, np.ndarray] = {}
+    wanted = sorted({k for k in keys if k})
+    for i in range(0, len(wanted), 500):
+        for r in conn.execute(
+            "SELECT text_sha1, dtype, data FROM embedding_cache "
+            "WHERE model=? AND text_sha1 IN (SELECT value FROM json_each(?))",
+            (EMBED_MODEL, json.dumps(wanted[i:i+500])),
+        ):
+            cached[r[0]] = np.frombuffer(r[2], dtype=np.dtype(r[1])).astype(np.float32)
+
+    todo: Dict[str, str] = {}
+    for k, t in zip(keys, texts):
+        if k and k not in cached and k not in todo:
+            todo[k] = t
+    with _EMBED_STATS_LOCK:
+        EMBED_CACHE_STATS["hits"] += sum(1 for k in keys if k) - len(todo)
+        EMBED_CACHE_STATS["misses"] += len(todo)
+
+    rows = []
+    if todo:
+        new = _embed_uncached(list(todo.values()))
+        for k, v in zip(todo, new):
+            if isinstance(v, np.ndarray):
+                cached[k] = v
+                rows.append((k, EMBED_MODEL, int(v.shape[0]), "float32", v.astype(np.float32).tobytes()))
+    return [cached.get(k) if k else None for k in keys], rows
+
+def embed_cache_summary() -> str:
+    h, m = EMBED_CACHE_STATS["hits"], EMBED_CACHE_STATS["misses"]
+    return f"embedding cache: {h} hits, {m} misses ({(100.0 * h / (h + m)) if (h + m) else 0.0:.1f}% hit rate)"
+
+def seed_embedding_cache(conn: sqlite3.Connection, batch: int = 5000):
+    """
+    Fill embedding_cache from existing chunk_vec rows (assumed to be EMBED_MODEL
+    vectors of this version's embedding_inputs). Each vector is keyed on the
+    text it was computed from: the chunk plus the overlap from its predecessor.
+    Entries an earlier seeder stored under the plain chunk text (same bytes as
+    this chunk's overlap vector) are removed.
+    """
+    last, added, dropped = 0, 0, 0
+    while True:
+        rows = conn.execute("""
+            SELECT c.chunk_id, c.text, c.section, c.page_start,
+                   p.text AS prev_text, p.section AS prev_section, p.page_start AS prev_page,
+                   v.dim, v.dtype, v.data
+            FROM chunk c JOIN chunk_vec v ON v.chunk_id = c.chunk_id
+            LEFT JOIN chunk p ON p.document_id = c.document_id AND p.chunk_index = c.chunk_index - 1
+            WHERE c.chunk_id > ?
+            ORDER BY c.chunk_id
+            LIMIT ?
+        """, (last, batch)).fetchall()
+        if not rows:
+            break
+        last = rows[-1]["chunk_id"]
+        keys = [embed_cache_key(stored_embedding_input(r)) for r in rows]
+        plain = [embed_cache_key(embedding_inputs([(database_manager.decode_text(r["text"]) or "", {})], 0)[0])
+                 for r in rows]
+        cur = conn.executemany(
+            "DELETE FROM embedding_cache WHERE text_sha1=? AND model=? AND data=?",
+            [(pk, EMBED_MODEL, r["data"]) for r, k, pk in zip(rows, keys, plain) if pk != k],
+        )
+        dropped += max(cur.rowcount, 0)
+        cur = conn.executemany(
+            "INSERT OR IGNORE INTO embedding_cache(text_sha1, model, dim, dtype, data) VALUES (?,?,?,?,?)",
+            [(k, EMBED_MODEL, r["dim"], r["dtype"], r["data"]) for r, k in zip(rows, keys)],
+        )
+        added += max(cur.rowcount, 0)
+        conn.commit()
+        print(f"[migrate] embedding_cache ... {added} vectors added (up to chunk_id {last})")
+    print(f"[migrate] embedding_cache seeded with {added} vectors ({dropped} mis-keyed entries removed).")
 
 def title_from_filename(path: str) -> str:
     base = os.path.basename(path)
@@ -179,24 +582,41 @@ def discover_files(root: str, pattern: str) -> List[str]:
         out.extend(glob.glob(os.path.join(root, p), recursive=True))
     seen, uniq = set(), []
     for f in out:
+        if os.path.basename(f).startswith("~$"):
+            continue  # Word's owner/lock file for a document that is open
         if f not in seen:
             uniq.append(f); seen.add(f)
     return uniq
 
 # ---------- Date extraction (YYMMDD at end of filename) ----------
-def extract_publish_date(path: str) -> Optional[str]:
-    name = os.path.basename(path)
-    stem, _ = os.path.splitext(name)
+def _yymmdd_to_iso(yymmdd: str) -> Optional[str]:
+    yy, mm, dd = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:6])
+    try:
+        return datetime.date(2000 + yy, mm, dd).strftime("%Y-%m-%d")
+    except Exception:
+        return None
+
+def _filename_date(path: str) -> Optional[str]:
+    stem, _ = os.path.splitext(os.path.basename(path or ""))
     m = re.search(r'(\d{6})$', stem)
-    if m:
-        yymmdd = m.group(1)
-        yy, mm, dd = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:6])
-        year = 2000 + yy
-        try:
-            dt = datetime.date(year, mm, dd)
-            return dt.strftime("%Y-%m-%d")
-        except Exception:
-            pass
+    return _yymmdd_to_iso(m.group(1)) if m else None
+
+def extract_path_date(path: str) -> Optional[str]:
+    """
+    YYYY-MM-DD from the first 6-digit run (YYMMDD) anywhere in a file path, or
+    None (stored as document.published_date). Same rule as config.DATE_RE in
+    query_manager.get_doc_path_date, so the stored column and the query-time
+    fallback agree even when a folder name holds 6 digits.
+    """
+    if not path:
+        return None
+    m = re.search(r'(\d{6})', path)
+    return _yymmdd_to_iso(m.group(1)) if m else None
+
+def extract_publish_date(path: str) -> Optional[str]:
+    iso = _filename_date(path)
+    if iso:
+        return iso
     try:
         ts = datetime.datetime.fromtimestamp(os.path.getmtime(path))
         return ts.strftime("%Y-%m-%d")
@@ -230,8 +650,44 @@ def iter_block_items(parent):
 
 # ---------- Images ----------
 def save_image_part(image_part, media_dir: Path, preferred_ext: Optional[str]=None) -> Dict[str, Any]:
-    image_bytes = image_part.blob
-    content_type = image_part.content_type
+    return save_image_bytes(image_part.blob, image_part.content_type, media_dir, preferred_ext)
+
+def image_size_from_header(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """(width, height) from the PNG/GIF/BMP/JPEG header bytes, no pixel decode; (None, None) if unknown."""
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return struct.unpack(">II", data[16:24])
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", data[6:10])
+        if data[:2] == b"BM":
+            w, h = struct.unpack("<ii", data[18:26])
+            return w, abs(h)
+        if data[:2] == b"\xff\xd8":
+            i = 2
+            while i + 9 < len(data):
+                if data[i] != 0xFF:
+                    i += 1; continue
+                marker = data[i + 1]
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                    i += 1 if marker == 0xFF else 2
+                    continue
+                seg_len = struct.unpack(">H", data[i + 2:i + 4])[0]
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                    return w, h
+                i += 2 + seg_len
+    except struct.error:
+        pass
+    return None, None
+
+def save_image_bytes(image_bytes: bytes, content_type: str, media_dir: Path,
+                     preferred_ext: Optional[str]=None) -> Dict[str, Any]:
+    """
+    Content-addressed media store: the blob lives at <media_dir>/<sha[:2]>/<sha256><ext>
+    and is written only the first time it is seen (logos and repeated charts are
+    stored once). Dimensions come from the header; PIL (lazy open, no decode) is
+    only asked for formats the header reader does not know.
+    """
     ext_map = {
         "image/png": ".png", "image/jpeg": ".jpg", "image/jpg": ".jpg",
         "image/gif": ".gif", "image/tiff": ".tif", "image/bmp": ".bmp",
@@ -240,26 +696,49 @@ def save_image_part(image_part, media_dir: Path, preferred_ext: Optional[str]=No
         "image/x-emz": ".emz",
     }
     ext = preferred_ext or ext_map.get(content_type, ".bin")
-    media_dir.mkdir(parents=True, exist_ok=True)
-    fname = f"{uuid.uuid4().hex}{ext}"
-    fpath = media_dir / fname
-    with open(fpath, "wb") as f:
-        f.write(image_bytes)
-    width_px = height_px = None
-    try:
-        im = Image.open(BytesIO(image_bytes))
-        width_px, height_px = im.size
-    except Exception:
-        pass
+    sha = hashlib.sha256(image_bytes).hexdigest()
+    fpath = media_dir / sha[:2] / f"{sha}{ext}"
+    if not fpath.exists():
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        tmp = fpath.with_name(f"{fpath.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(image_bytes)
+        os.replace(tmp, fpath)  # atomic: parallel workers may store the same blob
+    width_px, height_px = image_size_from_header(image_bytes)
+    if width_px is None:
+        try:
+            im = Image.open(BytesIO(image_bytes))
+            width_px, height_px = im.size
+        except Exception:
+            pass
     meta = {
         "type": "image",
         "file": fpath.as_posix(),
         "content_type": content_type,
         "width_px": width_px,
         "height_px": height_px,
+        "sha256": sha,
+        "size_bytes": len(image_bytes),
     }
     return meta
 
+def tree_media(node: Any, out: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """{sha256: image meta + "uses"} for every stored image in a document tree."""
+    if out is None:
+        out = {}
+    if isinstance(node, dict):
+        if node.get("type") == "image" and node.get("sha256"):
+            ref = out.setdefault(node["sha256"], {**node, "uses": 0})
+            ref["uses"] += 1
+            return out
+        for v in node.values():
+            if isinstance(v, (dict, list)):
+                tree_media(v, out)
+    elif isinstance(node, list):
+        for v in node:
+            tree_media(v, out)
+    return out
+
 def extract_images_from_runs(paragraph, media_dir: Path) -> List[Dict[str, Any]]:
     images: List[Dict[str, Any]] = []
     for run in paragraph.runs:
@@ -451,83 +930,1133 @@ def iter_text_chunks_with_debug_labels(document: Document, media_dir: Path) -> L
 
     return out
 
-# ---------- Ingest one DOCX ----------
-def ingest_one_docx(conn: sqlite3.Connection, full_path: str, out_root: Path):
-    title = title_from_filename(full_path)
-    meta_base = {"source": "docx_ingest", "absolute_path": full_path}
+# ---------- Streaming DOCX reader (one lxml pass, no python-docx DOM) ----------
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_PKG_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+W_BODY, W_P, W_TBL, W_TR, W_TC, W_R = (f"{{{_W}}}{t}" for t in ("body", "p", "tbl", "tr", "tc", "r"))
+W_VAL = f"{{{_W}}}val"
+A_BLIP = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+WP_EXTENT = "{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}extent"
+# Run children python-docx turns into text (w:br only when it is a line break)
+_RUN_TEXT = {f"{{{_W}}}tab": "\t", f"{{{_W}}}ptab": "\t", f"{{{_W}}}cr": "\n", f"{{{_W}}}noBreakHyphen": "-"}
+# python-docx reports these built-in styles by their UI name
+_UI_STYLE_NAMES = {"caption": "Caption", "footer": "Footer", "header": "Header",
+                   **{f"heading {i}": f"Heading {i}" for i in range(1, 10)}}
+
+def _zip_rels(zf: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """{rId: (type, part name)} for a part's internal relationships."""
+    base, name = posixpath.split(part)
+    rels_path = posixpath.join(base, "_rels", name + ".rels")
+    if rels_path not in zf.namelist():
+        return {}
+    out: Dict[str, Tuple[str, str]] = {}
+    for rel in etree.fromstring(zf.read(rels_path)).iter(f"{{{_PKG_REL}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target") or ""
+        target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+        out[rel.get("Id")] = (rel.get("Type") or "", target)
+    return out
 
-    # Build tree + save media (for viewer/debug)
-    doc = Document(full_path)
-    media_dir = out_root / (Path(full_path).stem + "_media")
-    tree = build_tree(doc, media_dir)
+def _zip_content_types(zf: zipfile.ZipFile) -> Tuple[Dict[str, str], Dict[str, str]]:
+    root = etree.fromstring(zf.read("[Content_Types].xml"))
+    overrides = {(e.get("PartName") or "").lstrip("/"): e.get("ContentType") for e in root.iter(f"{{{_PKG_CT}}}Override")}
+    defaults = {(e.get("Extension") or "").lower(): e.get("ContentType") for e in root.iter(f"{{{_PKG_CT}}}Default")}
+    return overrides, defaults
+
+def _paragraph_style_names(zf: zipfile.ZipFile, styles_part: Optional[str]) -> Tuple[Dict[str, Optional[str]], Optional[str]]:
+    """({styleId: name}, default name) for paragraph styles, as python-docx resolves them."""
+    if not styles_part or styles_part not in zf.namelist():
+        return {}, "Normal"  # python-docx falls back to its template styles
+    by_id: Dict[str, Optional[str]] = {}
+    default: Optional[str] = None
+    for st in etree.fromstring(zf.read(styles_part)).iter(f"{{{_W}}}style"):
+        if (st.get(f"{{{_W}}}type") or "paragraph") != "paragraph":
+            continue
+        name_el = st.find(f"{{{_W}}}name")
+        name = name_el.get(W_VAL) if name_el is not None else None
+        name = _UI_STYLE_NAMES.get(name, name) if name is not None else None
+        sid = st.get(f"{{{_W}}}styleId")
+        if sid is not None and sid not in by_id:
+            by_id[sid] = name
+        if st.get(f"{{{_W}}}default") in ("1", "true", "on"):
+            default = name
+    return by_id, default
+
+def _run_text(r) -> str:
+    parts: List[str] = []
+    for e in r:
+        if e.tag == f"{{{_W}}}t":
+            parts.append(e.text or "")
+        elif e.tag == f"{{{_W}}}br":
+            if (e.get(f"{{{_W}}}type") or "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif e.tag in _RUN_TEXT:
+            parts.append(_RUN_TEXT[e.tag])
+    return "".join(parts)
+
+def _paragraph_text(p) -> str:
+    """Same text as python-docx Paragraph.text (runs + hyperlink runs)."""
+    parts: List[str] = []
+    for e in p:
+        if e.tag == W_R:
+            parts.append(_run_text(e))
+        elif e.tag == f"{{{_W}}}hyperlink":
+            parts.extend(_run_text(r) for r in e.iterchildren(W_R))
+    return "".join(parts)
+
+def _child_val(el, *path: str) -> Optional[str]:
+    for tag in path:
+        el = el.find(f"{{{_W}}}{tag}") if el is not None else None
+    return el.get(W_VAL) if el is not None else None
+
+def _docx_package(zf: zipfile.ZipFile, media_dir: Path) -> Dict[str, Any]:
+    """Zip-level view of a DOCX: main document part, its rels, paragraph style names, content types."""
+    document_part = "word/document.xml"
+    for rtype, target in _zip_rels(zf, "").values():
+        if rtype.endswith("/officeDocument"):
+            document_part = target
+    rels = _zip_rels(zf, document_part)
+    styles_part = next((t for rt, t in rels.values() if rt.endswith("/styles")), None)
+    styles, default_style = _paragraph_style_names(zf, styles_part)
+    overrides, defaults = _zip_content_types(zf)
+    return {"zf": zf, "names": set(zf.namelist()), "media_dir": media_dir, "document_part": document_part,
+            "rels": rels, "styles": styles, "default_style": default_style,
+            "overrides": overrides, "defaults": defaults}
+
+def _docx_style_name(pkg: Dict[str, Any], p) -> Optional[str]:
+    sid = _child_val(p, "pPr", "pStyle")
+    if sid is None or sid not in pkg["styles"]:
+        return pkg["default_style"]
+    return pkg["styles"][sid]
+
+def _docx_paragraph_images(pkg: Dict[str, Any], p) -> List[Dict[str, Any]]:
+    """extract_images_from_runs for a w:p element."""
+    images: List[Dict[str, Any]] = []
+    for r in p.iterchildren(W_R):
+        for blip in r.iter(A_BLIP):
+            rel = pkg["rels"].get(blip.get(f"{{{_R}}}embed") or "")
+            if rel is None or rel[1] not in pkg["names"]:
+                continue
+            part = rel[1]
+            content_type = (pkg["overrides"].get(part)
+                            or pkg["defaults"].get(posixpath.splitext(part)[1][1:].lower(), ""))
+            meta = save_image_bytes(pkg["zf"].read(part), content_type, pkg["media_dir"])
+            try:
+                extent = next(r.iter(WP_EXTENT), None)
+                if extent is not None:
+                    cx = extent.get("cx"); cy = extent.get("cy")
+                    if cx and cy:
+                        meta["drawn_width_px"]  = int(round(int(cx) / 9525))
+                        meta["drawn_height_px"] = int(round(int(cy) / 9525))
+            except Exception:
+                pass
+            images.append(meta)
+    return images
 
-    # Published date (YYMMDD at end)
-    pub = extract_publish_date(full_path)
+def _docx_paragraph_node(pkg: Dict[str, Any], p) -> Dict[str, Any]:
+    return {
+        "type": "paragraph",
+        "style": _docx_style_name(pkg, p),
+        "text": _paragraph_text(p),
+        "inline_images": _docx_paragraph_images(pkg, p),
+    }
 
-    # Save tree JSON
-    out_root.mkdir(parents=True, exist_ok=True)
-    tree_path = out_root / (Path(full_path).stem + "_tree.json")
-    with open(tree_path, "w", encoding="utf-8") as f:
-        json.dump(tree, f, ensure_ascii=False, indent=2)
+def _docx_cell(pkg: Dict[str, Any], tc) -> Tuple[List[Dict[str, Any]], str]:
+    """(tree blocks, chunk text) for one w:tc."""
+    blocks: List[Dict[str, Any]] = []
+    parts: List[str] = []
+    for child in tc:
+        if child.tag == W_P:
+            node = _docx_paragraph_node(pkg, child)
+            blocks.append(node)
+            txt = node["text"].strip()
+            if txt:
+                parts.append(txt)
+        elif child.tag == W_TBL:
+            blocks.append(_docx_table(pkg, child)[0])
+    return blocks, " ".join(parts)
+
+def _docx_table(pkg: Dict[str, Any], tbl) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    (tree node, cell texts) for a w:tbl, with python-docx row.cells semantics:
+    a gridSpan cell repeats once per grid column, a vMerge continuation
+    repeats the cell it continues. Each distinct cell is read once.
+    """
+    rows: List[List[Tuple[List[Dict[str, Any]], str]]] = []
+    above: Dict[int, Tuple[List[Dict[str, Any]], str]] = {}
+    for tr in tbl.iterchildren(W_TR):
+        row: List[Tuple[List[Dict[str, Any]], str]] = []
+        offset = int(_child_val(tr, "trPr", "gridBefore") or 0)
+        for tc in tr.iterchildren(W_TC):
+            span = int(_child_val(tc, "tcPr", "gridSpan") or 1)
+            vmerge = tc.find(f"{{{_W}}}tcPr/{{{_W}}}vMerge")
+            cell = None
+            if vmerge is not None and (vmerge.get(W_VAL) or "continue") == "continue":
+                cell = above.get(offset)
+            if cell is None:
+                cell = _docx_cell(pkg, tc)
+            above[offset] = cell
+            row.extend([cell] * span)
+            offset += span
+        rows.append(row)
+
+    cell_texts = [text for row in rows for _, text in row if text]
+    n_cols = len(tbl.findall(f"{{{_W}}}tblGrid/{{{_W}}}gridCol"))
+    if len(rows) >= 2 and n_cols == 1 and rows[0] and rows[1]:
+        row0_blocks, row1_blocks = rows[0][0][0], rows[1][0][0]
+        cap_text = None
+        if row0_blocks and row0_blocks[0].get("type") == "paragraph":
+            p0 = row0_blocks[0]
+            if is_caption_paragraph_text_style(p0.get("style"), p0.get("text", "")):
+                cap_text = p0.get("text", "")
+        image_nodes: List[Dict[str, Any]] = []
+        for b in row1_blocks:
+            if b.get("type") == "paragraph" and b.get("inline_images"):
+                image_nodes.extend(b["inline_images"])
+        if cap_text and image_nodes:
+            return make_figure_node(cap_text, image_nodes), cell_texts
+    rows_json = [[{"type": "cell", "blocks": blocks} for blocks, _ in row] for row in rows]
+    return {"type": "table", "rows": rows_json}, cell_texts
+
+def stream_docx_chunks(full_path: str, media_dir: Path,
+                       tree: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    One iterparse pass over the main document part. Yields the same
+    (text, meta) chunks as iter_text_chunks_with_debug_labels and, if `tree`
+    is given (a {"type": "document", "children": []} root), fills it exactly
+    like build_tree, saving media on the way. Only one top-level block is held
+    in memory at a time; the tree is complete once the generator is exhausted.
+    """
+    section_path: List[str] = []
+    current_label: Optional[int] = None
+    section_stack: List[Dict[str, Any]] = [tree] if tree is not None else []
+
+    def push_section(title: str, level: int):
+        node = {"type": "section", "title": title, "level": level, "children": []}
+        while len(section_stack) > 1 and section_stack[-1].get("level", 0) >= level:
+            section_stack.pop()
+        section_stack[-1]["children"].append(node)
+        section_stack.append(node)
+
+    def chunk(text: str, kind: str):
+        meta = {"kind": kind, "section_path": " > ".join([p for p in section_path if p]) or None}
+        if current_label is not None:
+            meta["pdf_page"] = int(current_label)
+        return (text, meta)
+
+    with zipfile.ZipFile(full_path) as zf:
+        pkg = _docx_package(zf, media_dir)
+        with zf.open(pkg["document_part"]) as fh:
+            for _, el in etree.iterparse(fh, events=("end",), tag=(W_P, W_TBL)):
+                parent = el.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    continue  # nested block: handled with its top-level table
+                if el.tag == W_P:
+                    raw = _paragraph_text(el).strip()
+                    level = heading_level_from_style(_docx_style_name(pkg, el))
+                    if level:
+                        if tree is not None:
+                            push_section(raw, level)
+                        while len(section_path) >= level:
+                            section_path.pop()
+                        section_path.append(raw)
+                    else:
+                        if tree is not None:
+                            section_stack[-1]["children"].append(_docx_paragraph_node(pkg, el))
+                        m = RE_DEBUG_LINE.match(re.sub(r"\s+", " ", raw))
+                        if m:
+                            current_label = int(m.group(1))
+                            print(f"[DOCX marker] set current pdf_page = {current_label}")
+                        elif raw:
+                            yield chunk(raw, "paragraph")
+                else:
+                    node, cell_texts = _docx_table(pkg, el)
+                    if tree is not None:
+                        section_stack[-1]["children"].append(node)
+                    for text in cell_texts:
+                        yield chunk(text, "table_cell")
+                # Drop the finished block and everything before it
+                el.clear()
+                while el.getprevious() is not None:
+                    del parent[0]
+
+    if tree is not None:
+        tree["children"] = coalesce_figures_in_blocks(tree["children"])
+
+# ---------- Chunking ----------
+def merge_chunks(blocks: List[Tuple[str, Dict[str, Any]]],
+                 target_tokens: int = CHUNK_TARGET_TOKENS) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Merge adjacent (text, meta) blocks from the DOCX readers into retrieval-sized
+    chunks. Only blocks with the same pdf_page and section_path are merged, so
+    page_start/page_end stay exact; a block larger than the target stays whole.
+    Texts are joined with newlines (same tokens for FTS, postings and company counts).
+    """
+    if target_tokens <= 0:
+        return list(blocks)
+    out: List[Tuple[str, Dict[str, Any]]] = []
+    cur: List[str] = []
+    cur_meta: Optional[Dict[str, Any]] = None
+    cur_tokens = 0
+
+    def flush():
+        if cur:
+            out.append(("\n".join(cur), {**cur_meta, "blocks": len(cur)}))
+
+    for text, meta in blocks:
+        n = _estimate_tokens(text)
+        same = (cur_meta is not None
+                and meta.get("pdf_page") == cur_meta.get("pdf_page")
+                and meta.get("section_path") == cur_meta.get("section_path"))
+        if same and cur_tokens + n <= target_tokens:
+            cur.append(text)
+            cur_tokens += n
+            if meta.get("kind") != cur_meta.get("kind"):
+                cur_meta["kind"] = "mixed"
+            continue
+        flush()
+        cur, cur_meta, cur_tokens = [text], dict(meta), n
+    flush()
+    return out
+
+def embedding_inputs(chunks: List[Tuple[str, Dict[str, Any]]],
+                     overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Text sent to the embedding model per chunk: the chunk, prefixed with the tail
+    (~overlap_tokens, cut at a word) of the previous chunk on the same page and
+    section. The overlap lives only in the vector; stored text, FTS, postings
+    and company counts never see a word twice.
+    """
+    texts = [re.sub(r"\s+", " ", t).strip() for t, _ in chunks]
+    if overlap_tokens <= 0:
+        return [t[:6000] for t in texts]
+    out: List[str] = []
+    for i, (t, meta) in enumerate(chunks):
+        own = texts[i][:6000]
+        prev_meta = chunks[i - 1][1] if i else None
+        # the chunk is cut to the cap first; the tail only gets what is left
+        room = min(overlap_tokens * 4, 6000 - len(own) - 1)
+        if (prev_meta is not None and room > 0
+                and prev_meta.get("pdf_page") == meta.get("pdf_page")
+                and prev_meta.get("section_path") == meta.get("section_path")):
+            tail = texts[i - 1][-room:]
+            tail = tail.split(" ", 1)[1] if " " in tail and len(texts[i - 1]) > len(tail) else tail
+            out.append(f"{tail} {own}" if tail else own)
+        else:
+            out.append(own)
+    return out
+
+def stored_embedding_input(row) -> str:
+    """
+    embedding_inputs for a stored chunk row with its predecessor's text/section/page
+    joined in (prev_text, prev_section, prev_page; NULL for the first chunk).
+    """
+    pair = [(database_manager.decode_text(row["text"]) or "", {"pdf_page": row["page_start"], "section_path": row["section"]})]
+    if row["prev_text"] is not None:
+        pair.insert(0, (database_manager.decode_text(row["prev_text"]) or "",
+                        {"pdf_page": row["prev_page"], "section_path": row["prev_section"]}))
+    return embedding_inputs(pair)[-1]
+
+# ---------- Vectors ----------
+def chunk_vec_row(chunk_id: int, vec: np.ndarray) -> Tuple[int, int, str, bytes]:
+    v = np.asarray(vec, dtype=np.float32)
+    return (int(chunk_id), int(v.shape[0]), "float32", v.tobytes())
+
+def _centroid(vecs: List[np.ndarray]) -> np.ndarray:
+    c = np.mean(np.vstack(vecs), axis=0)
+    c = c / (np.linalg.norm(c) + 1e-9)
+    return c.astype(np.float16)
+
+def write_document_centroids(conn: sqlite3.Connection, document_id: int,
+                             pages: List[Optional[int]], vecs: List[Optional[np.ndarray]]):
+    """Store per-document and per-page centroid embeddings (float16) from chunk vectors."""
+    conn.execute("DELETE FROM document_vec WHERE document_id=?", (int(document_id),))
+    conn.execute("DELETE FROM page_vec WHERE document_id=?", (int(document_id),))
+    have = [(p, v) for p, v in zip(pages, vecs) if isinstance(v, np.ndarray)]
+    if not have:
+        return
+    dim = int(have[0][1].shape[0])
+    have = [(p, v) for p, v in have if int(v.shape[0]) == dim]
+    doc_c = _centroid([v for _, v in have])
+    conn.execute(
+        "INSERT INTO document_vec(document_id, n_chunks, dim, dtype, data) VALUES (?,?,?,?,?)",
+        (int(document_id), len(have), dim, "float16", doc_c.tobytes()),
+    )
+    by_page: Dict[int, List[np.ndarray]] = {}
+    for p, v in have:
+        if isinstance(p, int):
+            by_page.setdefault(p, []).append(v)
+    conn.executemany(
+        "INSERT INTO page_vec(document_id, page, n_chunks, dim, dtype, data) VALUES (?,?,?,?,?,?)",
+        [(int(document_id), p, len(vs), dim, "float16", _centroid(vs).tobytes()) for p, vs in by_page.items()],
+    )
+
+# ---------- Page-1 overview ----------
+def write_document_overview(conn: sqlite3.Connection, document_id: int, page1_texts: List[str]):
+    """Store the joined page-1 chunk texts for one document."""
+    page1_text = "\n".join(t for t in page1_texts if t)
+    conn.execute(
+        "INSERT OR REPLACE INTO document_overview(document_id, page1_text, n_chunks, updated_at) "
+        "VALUES (?,?,?,?)",
+        (
+            int(document_id),
+            page1_text,
+            len([t for t in page1_texts if t]),
+            datetime.datetime.utcnow().isoformat(),
+        )
+    )
+
+# ---------- Token postings ----------
+def write_term_postings(conn: sqlite3.Connection, document_id: int,
+                        chunks: List[Tuple[Optional[str], Optional[int]]]):
+    """Replace one document's positional postings; chunks are (text, page) in reading order."""
+    conn.execute("DELETE FROM term_posting WHERE document_id=?", (int(document_id),))
+    postings, starts, pages = term_index.document_postings(chunks)
+    n_tokens = sum(len(p) for p in postings.values())
+    conn.execute(
+        "INSERT OR REPLACE INTO term_doc(document_id, n_tokens, chunk_starts, chunk_pages) VALUES (?,?,?,?)",
+        (int(document_id), n_tokens,
+         np.asarray(starts, dtype=term_index.POSTING_DTYPE).tobytes(),
+         np.asarray(pages, dtype=term_index.POSTING_DTYPE).tobytes()),
+    )
+    if not postings:
+        return
+    conn.executemany("INSERT OR IGNORE INTO term_vocab(term) VALUES (?)", [(t,) for t in postings])
+    term_ids = dict(conn.execute(
+        "SELECT term, term_id FROM term_vocab WHERE term IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(postings)),),
+    ).fetchall())
+    conn.executemany(
+        "INSERT INTO term_posting(term_id, document_id, tf, positions) VALUES (?,?,?,?)",
+        [(term_ids[t], int(document_id), len(pos), term_index.encode_positions(pos)) for t, pos in postings.items()],
+    )
 
-    # Insert document with URI remapped to originals
-    mime = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# ---------- Ingest one DOCX ----------
+def parse_docx(full_path: str, out_root: Path) -> Dict[str, Any]:
+    """
+    CPU-bound half of the ingest (no DB, no network): parse the DOCX, save
+    tree JSON + media, and return the document fields and chunk list.
+    Picklable, so it can run in a worker process.
+    """
+    title = title_from_filename(full_path)
+    meta_base = {"source": "docx_ingest", "absolute_path": full_path}
+
+    # Build tree + save media (for viewer/debug), and chunks with DEBUG labels
+    media_dir = out_root / "media"
+    tree = chunks = None
+    if DOCX_STREAMING:
+        try:
+            tree = {"type": "document", "children": []}
+            chunks = list(stream_docx_chunks(full_path, media_dir, tree))
+        except Exception as e:
+            print(f"[ingest] streaming read failed for {full_path} ({e}); using python-docx")
+            tree = chunks = None
+    if chunks is None:
+        doc = Document(full_path)
+        tree = build_tree(doc, media_dir)
+        chunks = iter_text_chunks_with_debug_labels(doc, media_dir)
+    chunks = merge_chunks(chunks)
+
+    # Tree rows for document_tree_section (compressed here, in the worker)
+    meta_tree = {"tree_storage": "document_tree_section"}
+    if WRITE_TREE_JSON:
+        out_root.mkdir(parents=True, exist_ok=True)
+        tree_path = out_root / (Path(full_path).stem + "_tree.json")
+        with open(tree_path, "w", encoding="utf-8") as f:
+            json.dump(tree, f, ensure_ascii=False, separators=(",", ":"))
+        meta_tree["tree_json_path"] = tree_path.as_posix()
+
+    # Document fields, URI remapped to originals
     original_path = remap_to_original_root(full_path)
-    original_uri  = to_db_uri(original_path, ORIGINAL_ROOT)
-    meta = {**meta_base, "tree_json_path": tree_path.as_posix(), "page_source":"docx_debug_marker_pages"}
+    return {
+        "title": title,
+        "published_at": extract_publish_date(full_path),  # Published date (YYMMDD at end)
+        "published_date": extract_path_date(full_path),
+        "file_uri": to_db_uri(original_path, ORIGINAL_ROOT),
+        "mime_type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "meta": {**meta_base, **meta_tree, "page_source":"docx_debug_marker_pages"},
+        "chunks": chunks,
+        "media": list(tree_media(tree).values()),
+        "tree_sections": database_manager.tree_section_rows(tree),
+    }
+
+def write_chunks(conn: sqlite3.Connection, doc_id: int, title: str, subtitle: str,
+                 chunks: List[Tuple[str, Dict[str, Any]]], vecs: List[Optional[np.ndarray]],
+                 compress: bool = COMPRESS_TEXT):
+    """
+    chunk + chunk_fts + chunk_vec rows for one document, one executemany per table.
+    Chunk ids are pre-assigned: the ingest connection is the only writer and already
+    holds the write transaction (the document INSERT).
+    """
+    first_id = conn.execute("SELECT COALESCE(MAX(chunk_id), 0) + 1 FROM chunk").fetchone()[0]
+    chunk_rows, fts_rows, vec_rows = [], [], []
+    for i, ((text, meta_small), vec) in enumerate(zip(chunks, vecs)):
+        rid = first_id + i
+        pdf_page = meta_small.get("pdf_page")
+        page = int(pdf_page) if isinstance(pdf_page, int) else None
+        chunk_rows.append((
+            rid,
+            int(doc_id),
+            database_manager.encode_text(text, compress),
+            meta_small.get("section_path"),
+            i,
+            page,
+            page,
+            json.dumps(meta_small, ensure_ascii=False),
+        ))
+        fts_rows.append((rid, text or "", meta_small.get("section_path") or "", title or "", subtitle or ""))
+        if isinstance(vec, np.ndarray):
+            vec_rows.append(chunk_vec_row(rid, vec))
+    conn.executemany(
+        "INSERT INTO chunk(chunk_id, document_id, text, section, chunk_index, page_start, page_end, meta) "
+        "VALUES (?,?,?,?,?,?,?,?)",
+        chunk_rows,
+    )
+    conn.executemany("INSERT INTO chunk_fts(rowid, text, section, title, doc_meta) VALUES (?,?,?,?,?)", fts_rows)
+    conn.executemany("INSERT OR REPLACE INTO chunk_vec(chunk_id, dim, dtype, data) VALUES (?,?,?,?)", vec_rows)
+
+def write_document_tree(conn: sqlite3.Connection, document_id: int, rows: List[Tuple[int, Optional[int], int, Optional[str], Any]]):
+    conn.executemany(
+        "INSERT OR REPLACE INTO document_tree_section(document_id, section, parent, level, title, data) "
+        "VALUES (?,?,?,?,?,?)",
+        [(int(document_id), *r) for r in rows],
+    )
+
+def write_document_media(conn: sqlite3.Connection, document_id: int, media: List[Dict[str, Any]]):
+    now = datetime.datetime.utcnow().isoformat()
+    conn.executemany(
+        "INSERT OR IGNORE INTO media_blob(sha256, file, content_type, size_bytes, width_px, height_px, created_at) "
+        "VALUES (?,?,?,?,?,?,?)",
+        [(m["sha256"], m["file"], m.get("content_type"), m.get("size_bytes"), m.get("width_px"), m.get("height_px"), now)
+         for m in media],
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO media_ref(sha256, document_id, uses) VALUES (?,?,?)",
+        [(m["sha256"], int(document_id), int(m.get("uses") or 1)) for m in media],
+    )
+
+def store_parsed_docx(conn: sqlite3.Connection, parsed: Dict[str, Any], compress: bool = COMPRESS_TEXT,
+                      companies: Optional[Dict[str, Any]] = None):
+    """
+    Writer half of the ingest: embed the chunks and insert everything for one parsed DOCX.
+    companies: load_company_links() of the run (loaded here when omitted).
+    """
+    if companies is None:
+        companies = load_company_links(conn)
+    title, pub = parsed["title"], parsed["published_at"]
     doc_id = conn.execute(
-        "INSERT INTO document(title, published_at, file_uri, mime_type, meta) VALUES (?,?,?,?,?)",
-        (title, pub, original_uri, mime, json.dumps(meta, ensure_ascii=False))
+        "INSERT INTO document(title, published_at, published_date, file_uri, mime_type, meta) VALUES (?,?,?,?,?,?)",
+        (title, pub, parsed["published_date"], parsed["file_uri"], parsed["mime_type"],
+         database_manager.encode_text(json.dumps(parsed["meta"], ensure_ascii=False), compress))
     ).lastrowid
     print(f"[ingest] doc_id={doc_id} -> {title} (pub={pub})")
 
-    # Build chunks directly from DOCX flow with DEBUG labels
-    chunks = iter_text_chunks_with_debug_labels(doc, media_dir)
+    chunks = parsed["chunks"]
     texts  = [re.sub(r"\s+", " ", t[0]).strip()[:6000] for t in chunks]
-    vecs   = embed_texts(texts) if texts else []
+    if parsed.get("vecs") is not None:
+        # embedded ahead by the pipeline's embed stage
+        vecs = parsed["vecs"]
+        store_embed_cache_rows(conn, parsed.get("embed_cache_rows") or [])
+    else:
+        vecs = embed_texts(embedding_inputs(chunks), conn) if texts else []
 
-    # Link tickers
-    ensure_company_links(conn, doc_id, " ".join(texts)[:100000])
+    # Link tickers, names and aliases
+    ensure_company_links(conn, doc_id, " ".join(texts)[:100000], companies)
 
-    # Insert chunks (+ FTS) with real pdf_page from the DOCX markers
-    for i, ((text, meta_small), vec) in enumerate(zip(chunks, vecs)):
-        pdf_page = meta_small.get("pdf_page")
-        meta_small2 = dict(meta_small)
-
-        conn.execute(
-            "INSERT INTO chunk(document_id, text, section, chunk_index, page_start, page_end, meta, embedding) "
-            "VALUES (?,?,?,?,?,?,?,?)",
-            (
-                int(doc_id),
-                text,
-                meta_small2.get("section_path"),
-                i,
-                (int(pdf_page) if isinstance(pdf_page, int) else None),
-                (int(pdf_page) if isinstance(pdf_page, int) else None),
-                json.dumps(meta_small2, ensure_ascii=False),
-                (vec.tobytes() if isinstance(vec, np.ndarray) else None),
-            )
-        )
-        rid = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-        conn.execute("INSERT INTO chunk_fts(rowid, text) VALUES (?, ?)", (rid, text))
+    # Insert chunks (+ FTS + vectors) with real pdf_page from the DOCX markers
+    write_chunks(conn, doc_id, title, parsed["meta"].get("subtitle") or "", chunks, vecs, compress)
+
+    # Document / page centroids for pool ranking
+    write_document_centroids(conn, doc_id, [m.get("pdf_page") for _, m in chunks], vecs)
+
+    # Page-1 overview for query reformulation (same texts the backend splits out as [S# p1])
+    write_document_overview(conn, doc_id, [text for text, m in chunks if m.get("pdf_page") == 1])
+
+    # Token postings (same reading order as the backend's chunk fetches: page, chunk_index)
+    pages = [m.get("pdf_page") if isinstance(m.get("pdf_page"), int) else None for _, m in chunks]
+    order = sorted(range(len(chunks)), key=lambda i: (pages[i] if pages[i] is not None else 999999, i))
+    write_term_postings(conn, doc_id, [(chunks[i][0], pages[i]) for i in order])
+
+    # Document tree, one row per section
+    write_document_tree(conn, doc_id, parsed.get("tree_sections") or [])
+
+    # Media references (blobs are already on disk, written once per sha256)
+    write_document_media(conn, doc_id, parsed.get("media") or [])
+
+    # company_term_count for this document, so fetch_doc_pool sees it without a full rebuild
+    n = database_manager.update_company_counts_for_document(conn, doc_id, [text for text, _ in chunks],
+                                                         companies["matcher"])
+    print(f"[ingest] doc_id={doc_id} company_term_count rows={n}")
+    return doc_id
+
+def ingest_one_docx(conn: sqlite3.Connection, full_path: str, out_root: Path, compress: bool = COMPRESS_TEXT):
+    return store_parsed_docx(conn, parse_docx(full_path, out_root), compress=compress)
+
+# ---------- FTS merge control ----------
+def fts_defer_merges(conn: sqlite3.Connection):
+    """Stop chunk_fts merging segments on every commit while a bulk ingest runs."""
+    conn.execute("INSERT INTO chunk_fts(chunk_fts, rank) VALUES('automerge', 0)")
+    conn.commit()
+
+def fts_finish_merges(conn: sqlite3.Connection, pages: int = 500, max_rounds: int = 1000):
+    """Restore the default automerge and merge the segments the ingest left behind, `pages` at a time."""
+    conn.execute("INSERT INTO chunk_fts(chunk_fts, rank) VALUES('automerge', 4)")
+    for _ in range(max_rounds):
+        before = conn.total_changes
+        conn.execute("INSERT INTO chunk_fts(chunk_fts, rank) VALUES('merge', ?)", (pages,))
+        conn.commit()
+        if conn.total_changes - before < 2:
+            break
+
+# ---------- Incremental ingest (manifest) ----------
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def delete_document(conn: sqlite3.Connection, document_id: int):
+    """
+    Remove one document and everything derived from it (no commit). chunk_fts is
+    external-content, so its rows are deleted with the values they were indexed with.
+    """
+    did = int(document_id)
+    conn.execute("""
+        INSERT INTO chunk_fts(chunk_fts, rowid, text, section, title, doc_meta)
+        SELECT 'delete', c.chunk_id,
+               COALESCE(decode_text(c.text),''),
+               COALESCE(c.section,''),
+               COALESCE(d.title,''),
+               COALESCE(json_extract(decode_text(d.meta),'$.subtitle'),'')
+        FROM chunk c
+        JOIN document d ON d.document_id = c.document_id
+        WHERE c.document_id = ?
+    """, (did,))
+    conn.execute("DELETE FROM chunk_vec WHERE chunk_id IN (SELECT chunk_id FROM chunk WHERE document_id=?)", (did,))
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for t in ("chunk", "document_vec", "page_vec", "document_overview", "term_posting", "term_doc",
+              "document_company", "company_term_count", "media_ref", "document_tree_section"):
+        if t in tables:
+            conn.execute(f"DELETE FROM {t} WHERE document_id=?", (did,))
+    conn.execute("UPDATE ingest_manifest SET document_id=NULL WHERE document_id=?", (did,))
+    conn.execute("DELETE FROM document WHERE document_id=?", (did,))
+
+def seed_manifest_from_documents(conn: sqlite3.Connection):
+    """
+    First run with a manifest on an existing DB: adopt the newest document per
+    meta.absolute_path (files that still exist), so they are not re-ingested.
+    Older duplicates are left for --prune-duplicates.
+    """
+    latest: Dict[str, int] = {}
+    for row in conn.execute("SELECT document_id, meta FROM document ORDER BY document_id"):
+        try:
+            meta = json.loads(database_manager.decode_text(row["meta"])) if row["meta"] else {}
+        except Exception:
+            meta = {}
+        path = meta.get("absolute_path")
+        if path:
+            latest[path] = row["document_id"]
+    rows = []
+    for path, did in latest.items():
+        if os.path.isfile(path):
+            st = os.stat(path)
+            rows.append((path, st.st_size, st.st_mtime, file_sha256(path), did, datetime.datetime.utcnow().isoformat()))
+    conn.executemany("INSERT OR IGNORE INTO ingest_manifest(path, size, mtime, sha256, document_id, ingested_at) "
+                     "VALUES (?,?,?,?,?,?)", rows)
+    conn.commit()
+    print(f"[migrate] ingest_manifest seeded with {len(rows)} existing documents.")
+    if latest:
+        # older ingests indexed chunk_fts with text only; re-index every column once so
+        # delete_document's 'delete' rows match what is in the index
+        rebuild_chunk_fts_from_existing(conn)
+
+def prune_duplicate_documents(conn: sqlite3.Connection):
+    """Delete documents ingested more than once from the same path, keeping the manifest's (newest) one."""
+    keep = {r[0] for r in conn.execute("SELECT document_id FROM ingest_manifest WHERE document_id IS NOT NULL")}
+    by_path: Dict[str, List[int]] = {}
+    for row in conn.execute("SELECT document_id, meta FROM document ORDER BY document_id"):
+        try:
+            meta = json.loads(database_manager.decode_text(row["meta"])) if row["meta"] else {}
+        except Exception:
+            meta = {}
+        if meta.get("absolute_path"):
+            by_path.setdefault(meta["absolute_path"], []).append(row["document_id"])
+    n = 0
+    for path, ids in by_path.items():
+        winner = next((d for d in reversed(ids) if d in keep), ids[-1])
+        for did in ids:
+            if did != winner:
+                delete_document(conn, did)
+                bump_corpus_generation(conn)
+                n += 1
+        conn.commit()
+    print(f"[migrate] pruned {n} duplicate documents.")
+
+def gc_media(conn: sqlite3.Connection, out_root: Path):
+    """
+    Delete media blobs no document references (media_refcount.ref_count = 0),
+    plus files in the store that never made it into media_blob (failed ingests).
+    Run it while no ingest is writing to the same --out directory.
+    """
+    dead = conn.execute("SELECT sha256, file FROM media_refcount WHERE ref_count = 0").fetchall()
+    freed = 0
+    for row in dead:
+        try:
+            freed += os.path.getsize(row["file"])
+            os.remove(row["file"])
+        except OSError:
+            pass
+    conn.executemany("DELETE FROM media_blob WHERE sha256=?", [(row["sha256"],) for row in dead])
+    conn.commit()
+    known = {r[0] for r in conn.execute("SELECT sha256 FROM media_blob")}
+    stray = 0
+    for path in (out_root / "media").glob("??/*"):
+        if path.is_file() and path.name.split(".", 1)[0] not in known:
+            freed += path.stat().st_size
+            path.unlink()
+            stray += 1
+    print(f"[migrate] media gc: {len(dead)} unreferenced blobs, {stray} stray files, {freed / 1e6:.1f} MB freed.")
+
+# ---------- Ingest runs (checkpoints / --resume) ----------
+def start_run(conn: sqlite3.Connection, root: str, pattern: str, out_root: Path,
+              entries: List[Dict[str, Any]]) -> int:
+    run_id = conn.execute(
+        "INSERT INTO ingest_run(started_at, status, root, glob, out_dir, n_files) VALUES (?,?,?,?,?,?)",
+        (datetime.datetime.utcnow().isoformat(), "running", root, pattern, out_root.as_posix(), len(entries)),
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO ingest_run_file(run_id, path, status, updated_at) VALUES (?,?,?,?)",
+        [(run_id, e["path"], "pending", datetime.datetime.utcnow().isoformat()) for e in entries],
+    )
+    conn.commit()
+    print(f"[ingest] run {run_id}: {len(entries)} files")
+    return run_id
+
+def last_unfinished_run(conn: sqlite3.Connection) -> Optional[sqlite3.Row]:
+    return conn.execute(
+        "SELECT * FROM ingest_run WHERE status <> 'done' ORDER BY run_id DESC LIMIT 1"
+    ).fetchone()
+
+def checkpoint_file(conn: sqlite3.Connection, run_id: Optional[int], path: str, status: str,
+                    document_id: Optional[int] = None, error: Optional[str] = None):
+    """Record one file's outcome (no commit: the caller commits it with the document)."""
+    if run_id is None:
+        return
+    missing = None
+    if document_id is not None:
+        missing = conn.execute(
+            "SELECT COUNT(*) FROM chunk c WHERE c.document_id=? "
+            "AND NOT EXISTS (SELECT 1 FROM chunk_vec v WHERE v.chunk_id = c.chunk_id)", (document_id,)
+        ).fetchone()[0]
+    conn.execute(
+        "INSERT OR REPLACE INTO ingest_run_file(run_id, path, status, document_id, missing_vectors, error, updated_at) "
+        "VALUES (?,?,?,?,?,?,?)",
+        (run_id, path, status, document_id, missing, (error or "")[:1000] or None, datetime.datetime.utcnow().isoformat()),
+    )
+
+def finish_run(conn: sqlite3.Connection, run_id: int):
+    """
+    Retry the embeddings this run's documents are still missing, then close the
+    run: 'done', or 'incomplete' while files failed or vectors are still missing
+    (a later --resume picks it up again).
+    """
+    docs = [r[0] for r in conn.execute(
+        "SELECT document_id FROM ingest_run_file WHERE run_id=? AND status='done' AND missing_vectors > 0", (run_id,))]
+    if docs:
+        print(f"[ingest] run {run_id}: retrying embeddings for {len(docs)} documents")
+        backfill_missing_embeddings(conn, document_ids=docs)
+        for did in docs:
+            conn.execute(
+                "UPDATE ingest_run_file SET missing_vectors=("
+                "  SELECT COUNT(*) FROM chunk c WHERE c.document_id=? "
+                "  AND NOT EXISTS (SELECT 1 FROM chunk_vec v WHERE v.chunk_id = c.chunk_id)"
+                ") WHERE run_id=? AND document_id=?", (did, run_id, did))
+    stats = conn.execute(
+        "SELECT SUM(status='done'), SUM(status='error'), SUM(status='pending'), "
+        "SUM(CASE WHEN status='done' AND missing_vectors > 0 THEN 1 ELSE 0 END) "
+        "FROM ingest_run_file WHERE run_id=?", (run_id,)
+    ).fetchone()
+    done, failed, pending, missing = (int(x or 0) for x in stats)
+    status = "done" if not (failed or pending or missing) else "incomplete"
+    conn.execute("UPDATE ingest_run SET status=?, finished_at=? WHERE run_id=?",
+                 (status, datetime.datetime.utcnow().isoformat(), run_id))
+    conn.commit()
+    print(f"[ingest] run {run_id} {status}: {done} done, {failed} failed, {pending} pending, "
+          f"{missing} with missing vectors")
+
+def plan_ingest(conn: sqlite3.Connection, files: List[str], force: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compare files with ingest_manifest. Unchanged files (same size+mtime, or
+    same sha256) are skipped; the rest come back as
+    {path, size, mtime, sha256, old_document_id}.
+    """
+    manifest = {r["path"]: r for r in conn.execute("SELECT * FROM ingest_manifest")}
+    todo, touched = [], []
+    for path in files:
+        st = os.stat(path)
+        m = manifest.get(path)
+        has_doc = m is not None and m["document_id"] is not None
+        if has_doc and not force and m["size"] == st.st_size and m["mtime"] == st.st_mtime:
+            continue
+        sha = file_sha256(path)
+        if has_doc and not force and m["sha256"] == sha:
+            touched.append((st.st_size, st.st_mtime, path))  # touched, not changed
+            continue
+        todo.append({"path": path, "size": st.st_size, "mtime": st.st_mtime, "sha256": sha,
+                     "old_document_id": (m["document_id"] if m is not None else None)})
+    conn.executemany("UPDATE ingest_manifest SET size=?, mtime=? WHERE path=?", touched)
+    conn.commit()
+    print(f"[ingest] {len(files)} files: {len(todo)} new/changed, {len(files) - len(todo)} unchanged")
+    return todo
+
+def bump_corpus_generation(conn: sqlite3.Connection):
+    """Part of the caller's transaction, so readers see the new generation and the documents together."""
+    conn.execute("UPDATE corpus_generation SET generation = generation + 1, updated_at = ? WHERE id = 1",
+                 (datetime.datetime.utcnow().isoformat(),))
+
+def replace_document(conn: sqlite3.Connection, entry: Dict[str, Any], parsed: Dict[str, Any],
+                     compress: bool = COMPRESS_TEXT, companies: Optional[Dict[str, Any]] = None) -> int:
+    """Drop the file's previous document (if any), store the new one and record it (caller commits)."""
+    if entry.get("old_document_id") is not None:
+        print(f"[ingest] replacing doc_id={entry['old_document_id']} ({entry['path']})")
+        delete_document(conn, entry["old_document_id"])
+    doc_id = store_parsed_docx(conn, parsed, compress=compress, companies=companies)
+    conn.execute(
+        "INSERT OR REPLACE INTO ingest_manifest(path, size, mtime, sha256, document_id, ingested_at) VALUES (?,?,?,?,?,?)",
+        (entry["path"], entry["size"], entry["mtime"], entry["sha256"], doc_id, datetime.datetime.utcnow().isoformat()),
+    )
+    bump_corpus_generation(conn)
+    return doc_id
+
+def _parse_timed(path: str, out_root: Path) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    parsed = parse_docx(path, out_root)
+    parsed["parse_s"] = time.perf_counter() - t0
+    return parsed
+
+def embed_parsed(parsed: Dict[str, Any], db_path: str) -> Dict[str, Any]:
+    """
+    Embed stage of the pipeline: vectors for one parsed DOCX, looked up in
+    embedding_cache on a private connection (WAL: reads never block the writer).
+    New vectors are committed to the cache at once, in a short transaction.
+    """
+    chunks = parsed["chunks"]
+    if not chunks:
+        return {**parsed, "vecs": [], "embed_cache_rows": []}
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        vecs, rows = embed_texts_cached(embedding_inputs(chunks), conn)
+        # checkpoint the API work right away: a crash before this file is written
+        # costs a resumed run cache lookups, not embedding calls
+        try:
+            store_embed_cache_rows(conn, rows)
+            conn.commit()
+            rows = []
+        except sqlite3.OperationalError:
+            conn.rollback()  # writer busy for too long: it inserts them with the document
+    finally:
+        conn.close()
+    return {**parsed, "vecs": vecs, "embed_cache_rows": rows}
+
+def ingest_parallel(conn: sqlite3.Connection, entries: List[Dict[str, Any]], out_root: Path, workers: int,
+                    compress: bool = COMPRESS_TEXT, run_id: Optional[int] = None,
+                    companies: Optional[Dict[str, Any]] = None):
+    """
+    Staged ingest of plan_ingest entries: parse (`workers` processes) -> embed
+    (threads; API requests capped by EMBED_CONCURRENCY overall) -> this process
+    as the only SQLite writer (replace + commit per file, in file order, so
+    document_ids match a serial run).
+
+    At most 2*workers+EMBED_CONCURRENCY files are in flight; the writer only
+    admits a new file when it finishes one, so a slow stage backs the others
+    up instead of filling memory. Stages overlap, so a run takes about as long
+    as its slowest stage rather than the sum of all three. With a run_id each
+    file's outcome is checkpointed in the same commit as its document.
+    """
+    if companies is None:
+        companies = load_company_links(conn)
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    depth = 2 * workers + max(1, EMBED_CONCURRENCY)
+    busy = {"parse": 0.0, "embed": 0.0, "write": 0.0}
+    busy_lock = threading.Lock()  # embed threads add to busy["embed"] concurrently
+
+    def embed_when_parsed(fut) -> Dict[str, Any]:
+        parsed = fut.result()
+        t0 = time.perf_counter()
+        parsed = embed_parsed(parsed, db_path)
+        with busy_lock:
+            busy["embed"] += time.perf_counter() - t0
+        return parsed
+
+    t_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as parse_ex, ThreadPoolExecutor(max_workers=depth) as embed_ex:
+        pending = deque()
+        todo = iter(entries)
+        while True:
+            while len(pending) < depth:
+                e = next(todo, None)
+                if e is None:
+                    break
+                parse_fut = parse_ex.submit(_parse_timed, e["path"], out_root)
+                pending.append((e, embed_ex.submit(embed_when_parsed, parse_fut)))
+            if not pending:
+                break
+            e, fut = pending.popleft()
+            try:
+                parsed = fut.result()
+                busy["parse"] += parsed.get("parse_s", 0.0)
+                t0 = time.perf_counter()
+                doc_id = replace_document(conn, e, parsed, compress=compress, companies=companies)
+                checkpoint_file(conn, run_id, e["path"], "done", document_id=doc_id)
+                conn.commit()
+                busy["write"] += time.perf_counter() - t0
+            except Exception as err:
+                conn.rollback()
+                print(f"[ingest] ERROR {e['path']}: {err}")
+                checkpoint_file(conn, run_id, e["path"], "error", error=str(err))
+                conn.commit()
+    print(f"[ingest] pipeline: {len(entries)} files in {time.perf_counter() - t_start:.1f}s "
+          f"(busy: parse {busy['parse']:.1f}s over {workers} workers, embed {busy['embed']:.1f}s, "
+          f"write {busy['write']:.1f}s)")
 
 # ---------- Migration helper ----------
 def rebuild_chunk_fts_from_existing(conn: sqlite3.Connection):
-    conn.execute("DELETE FROM chunk_fts;")
+    # external-content FTS: 'delete-all' clears the index without reading chunk columns
+    conn.execute("INSERT INTO chunk_fts(chunk_fts) VALUES('delete-all');")
     conn.execute("""
         INSERT INTO chunk_fts(rowid, text, section, title, doc_meta)
         SELECT c.chunk_id,
-               COALESCE(c.text,''),
+               COALESCE(decode_text(c.text),''),
                COALESCE(c.section,''),
                COALESCE(d.title,''),
-               COALESCE(json_extract(d.meta,'$.subtitle'),'')
+               COALESCE(json_extract(decode_text(d.meta),'$.subtitle'),'')
         FROM chunk c
         JOIN document d ON d.document_id = c.document_id;
     """)
     conn.commit()
     print("[migrate] chunk_fts rebuilt from existing rows.")
 
+def rebuild_document_overviews(conn: sqlite3.Connection, batch: int = 100):
+    """(Re)build document_overview for every document from existing page-1 chunk rows."""
+    page1_by_doc: Dict[int, List[str]] = {int(r["document_id"]): [] for r in conn.execute("SELECT document_id FROM document")}
+    for row in conn.execute(
+        "SELECT document_id, text FROM chunk WHERE page_start = 1 ORDER BY document_id, chunk_index, chunk_id"
+    ):
+        t = (database_manager.decode_text(row["text"]) or "").strip()
+        if t and int(row["document_id"]) in page1_by_doc:
+            page1_by_doc[int(row["document_id"])].append(t)
+    doc_ids = sorted(page1_by_doc)
+    for i in range(0, len(doc_ids), batch):
+        part = doc_ids[i:i+batch]
+        for d in part:
+            write_document_overview(conn, d, page1_by_doc[d])
+        conn.commit()
+        print(f"[migrate] document_overview ... {min(i+batch, len(doc_ids))}/{len(doc_ids)}")
+    print(f"[migrate] document_overview rebuilt for {len(doc_ids)} documents.")
+
+def rebuild_centroids(conn: sqlite3.Connection, batch: int = 200, document_ids: Optional[List[int]] = None):
+    """(Re)build document_vec / page_vec for every (or the given) document from chunk_vec, `batch` documents at a time."""
+    if document_ids is not None:
+        doc_ids = sorted(int(d) for d in document_ids)
+    else:
+        doc_ids = [r["document_id"] for r in conn.execute("SELECT document_id FROM document ORDER BY document_id")]
+    for i in range(0, len(doc_ids), batch):
+        part = doc_ids[i:i+batch]
+        pages_by_doc: Dict[int, List[Optional[int]]] = {d: [] for d in part}
+        vecs_by_doc: Dict[int, List[np.ndarray]] = {d: [] for d in part}
+        for r in conn.execute("""
+            SELECT c.document_id, c.page_start, v.dtype, v.data
+            FROM chunk c JOIN chunk_vec v ON v.chunk_id = c.chunk_id
+            WHERE c.document_id IN (SELECT value FROM json_each(?))
+            ORDER BY c.document_id, c.chunk_id
+        """, (json.dumps(part),)).fetchall():
+            pages_by_doc[r["document_id"]].append(r["page_start"])
+            vecs_by_doc[r["document_id"]].append(np.frombuffer(r["data"], dtype=np.dtype(r["dtype"])).astype(np.float32))
+        for d in part:
+            write_document_centroids(conn, d, pages_by_doc[d], vecs_by_doc[d])
+        conn.commit()
+        print(f"[migrate] centroids ... {min(i+batch, len(doc_ids))}/{len(doc_ids)} documents")
+    print(f"[migrate] centroids rebuilt for {len(doc_ids)} documents.")
+
+def backfill_missing_embeddings(conn: sqlite3.Connection, batch: int = 1000,
+                                document_ids: Optional[List[int]] = None):
+    """
+    Embed chunks that have no chunk_vec row (failed or skipped at ingest), then
+    refresh the affected centroids. document_ids limits both to those documents
+    (None = all).
+    """
+    only = json.dumps([int(d) for d in document_ids]) if document_ids is not None else None
+    last, filled, touched = 0, 0, set()
+    while True:
+        rows = conn.execute("""
+            SELECT c.chunk_id, c.document_id, c.text, c.section, c.page_start,
+                   p.text AS prev_text, p.section AS prev_section, p.page_start AS prev_page
+            FROM chunk c
+            LEFT JOIN chunk p ON p.document_id = c.document_id AND p.chunk_index = c.chunk_index - 1
+            WHERE c.chunk_id > ?
+              AND NOT EXISTS (SELECT 1 FROM chunk_vec v WHERE v.chunk_id = c.chunk_id)
+              AND (? IS NULL OR c.document_id IN (SELECT value FROM json_each(?)))
+            ORDER BY c.chunk_id
+            LIMIT ?
+        """, (last, only, only, batch)).fetchall()
+        if not rows:
+            break
+        last = rows[-1]["chunk_id"]
+        vecs = embed_texts([stored_embedding_input(r) for r in rows], conn)
+        have = [(r, v) for r, v in zip(rows, vecs) if isinstance(v, np.ndarray)]
+        conn.executemany("INSERT OR REPLACE INTO chunk_vec(chunk_id, dim, dtype, data) VALUES (?,?,?,?)",
+                         [chunk_vec_row(r["chunk_id"], v) for r, v in have])
+        conn.commit()
+        filled += len(have)
+        touched.update(r["document_id"] for r, _ in have)
+        print(f"[migrate] embeddings ... {filled} chunk vectors filled (up to chunk_id {last})")
+    if touched:
+        rebuild_centroids(conn, document_ids=sorted(touched))
+    print(f"[migrate] backfilled {filled} chunk vectors.")
+
+def migrate_embeddings_to_chunk_vec(conn: sqlite3.Connection, batch: int = 5000):
+    """Move inline chunk.embedding BLOBs into chunk_vec, then drop (or NULL) the column."""
+    chunk_cols = {r[1] for r in conn.execute("PRAGMA table_info(chunk)")}
+    if "embedding" not in chunk_cols:
+        print("[migrate] chunk.embedding already split out; nothing to do.")
+        return
+    moved, last_id = 0, 0
+    while True:
+        rows = conn.execute(
+            "SELECT chunk_id, embedding FROM chunk WHERE chunk_id > ? AND embedding IS NOT NULL "
+            "ORDER BY chunk_id LIMIT ?",
+            (last_id, batch),
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["chunk_id"]
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunk_vec(chunk_id, dim, dtype, data) VALUES (?,?,?,?)",
+            [(r["chunk_id"], len(r["embedding"]) // 4, "float32", r["embedding"]) for r in rows],
+        )
+        conn.commit()
+        moved += len(rows)
+        print(f"[migrate] chunk_vec ... {moved} vectors moved")
+    try:
+        conn.execute("ALTER TABLE chunk DROP COLUMN embedding")
+    except sqlite3.OperationalError as e:
+        print(f"[migrate] cannot drop chunk.embedding ({e}); clearing it instead.")
+        conn.execute("UPDATE chunk SET embedding = NULL WHERE embedding IS NOT NULL")
+    conn.commit()
+    conn.execute("VACUUM")
+    print(f"[migrate] {moved} embeddings moved to chunk_vec.")
+
+def rebuild_term_postings(conn: sqlite3.Connection, batch: int = 200):
+    """(Re)build term_posting / term_doc for every document from stored chunk text."""
+    doc_ids = [r["document_id"] for r in conn.execute("SELECT document_id FROM document ORDER BY document_id")]
+    for i in range(0, len(doc_ids), batch):
+        part = doc_ids[i:i+batch]
+        chunks_by_doc: Dict[int, List[Tuple[Optional[str], Optional[int]]]] = {d: [] for d in part}
+        for r in conn.execute("""
+            SELECT document_id, text, page_start
+            FROM chunk
+            WHERE document_id IN (SELECT value FROM json_each(?))
+            ORDER BY document_id, COALESCE(page_start, 999999), chunk_index
+        """, (json.dumps(part),)).fetchall():
+            chunks_by_doc[r["document_id"]].append((database_manager.decode_text(r["text"]), r["page_start"]))
+        for d in part:
+            write_term_postings(conn, d, chunks_by_doc[d])
+        conn.commit()
+        print(f"[migrate] term postings ... {min(i+batch, len(doc_ids))}/{len(doc_ids)} documents")
+    print(f"[migrate] term postings rebuilt for {len(doc_ids)} documents.")
+
+def import_tree_json_files(conn: sqlite3.Connection):
+    """Load the _tree.json files earlier ingests wrote (meta.tree_json_path) into document_tree_section."""
+    have = {r[0] for r in conn.execute("SELECT DISTINCT document_id FROM document_tree_section")}
+    n, missing = 0, 0
+    for row in conn.execute("SELECT document_id, meta FROM document ORDER BY document_id").fetchall():
+        if row["document_id"] in have:
+            continue
+        try:
+            meta = json.loads(database_manager.decode_text(row["meta"])) if row["meta"] else {}
+        except Exception:
+            meta = {}
+        path = meta.get("tree_json_path")
+        if not path:
+            continue
+        if not os.path.isfile(path):
+            missing += 1
+            continue
+        with open(path, encoding="utf-8") as f:
+            tree = json.load(f)
+        write_document_tree(conn, row["document_id"], database_manager.tree_section_rows(tree))
+        conn.commit()
+        n += 1
+    print(f"[migrate] imported {n} tree JSON files into document_tree_section ({missing} files not found).")
+
+def backfill_published_dates(conn: sqlite3.Connection, only_missing: bool = True):
+    """Fill document.published_date from meta.absolute_path for existing rows."""
+    sql = "SELECT document_id, meta FROM document"
+    if only_missing:
+        sql += " WHERE published_date IS NULL"
+    updates = []
+    for row in conn.execute(sql).fetchall():
+        try:
+            meta = json.loads(database_manager.decode_text(row["meta"])) if row["meta"] else {}
+        except Exception:
+            meta = {}
+        iso = extract_path_date(meta.get("absolute_path") or "")
+        if iso:
+            updates.append((iso, row["document_id"]))
+    conn.executemany("UPDATE document SET published_date=? WHERE document_id=?", updates)
+    conn.commit()
+    print(f"[migrate] published_date backfilled for {len(updates)} documents.")
+
 # ---------- CLI ----------
+def ingest_files(conn: sqlite3.Connection, files: List[str], out_root: Path, root: str = "", pattern: str = "",
+                 workers: int = 1, compress: bool = COMPRESS_TEXT, force: bool = False, serial: bool = False,
+                 run_id: Optional[int] = None) -> int:
+    """
+    Incremental ingest of `files` as one checkpointed run: plan against the
+    manifest, parse/embed/write new or changed files, merge FTS segments, close
+    the run. run_id continues an existing run (--resume). Returns files written.
+    """
+    entries = plan_ingest(conn, files, force=force)
+    if run_id is not None:
+        # left over but unchanged since: already written (e.g. by a later run)
+        planned = {e["path"] for e in entries}
+        for f in files:
+            if f not in planned:
+                row = conn.execute("SELECT document_id FROM ingest_manifest WHERE path=?", (f,)).fetchone()
+                checkpoint_file(conn, run_id, f, "done", document_id=row["document_id"] if row else None)
+        conn.commit()
+    elif entries:
+        run_id = start_run(conn, root, pattern, out_root, entries)
+    if entries:
+        companies = load_company_links(conn)  # one ref_company read for the whole run
+        fts_defer_merges(conn)
+        try:
+            if not serial:
+                ingest_parallel(conn, entries, out_root, max(1, workers), compress=compress, run_id=run_id,
+                                companies=companies)
+            else:
+                db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+                for e in entries:
+                    try:
+                        parsed = embed_parsed(parse_docx(e["path"], out_root), db_path)
+                        doc_id = replace_document(conn, e, parsed, compress=compress, companies=companies)
+                        checkpoint_file(conn, run_id, e["path"], "done", document_id=doc_id)
+                        conn.commit()
+                    except Exception as err:
+                        conn.rollback()
+                        print(f"[ingest] ERROR {e['path']}: {err}")
+                        checkpoint_file(conn, run_id, e["path"], "error", error=str(err))
+                        conn.commit()
+        finally:
+            fts_finish_merges(conn)
+    if run_id is not None:
+        finish_run(conn, run_id)
+    return len(entries)
+
 def main():
     ap = argparse.ArgumentParser(description="Ingest DOCX using DOCX-embedded DEBUG pages to map real page numbers")
     ap.add_argument("--root", default=SOURCE_ROOT, help="DOCX root (debug copies)")
@@ -535,6 +2064,23 @@ def main():
     ap.add_argument("--glob", default="", help="Glob (e.g. '**/*.docx'); empty = all DOCX")
     ap.add_argument("--out", default=OUT_DIR, help="Output dir for trees/media")
     ap.add_argument("--rebuild-fts", action="store_true", help="Only rebuild chunk_fts from existing rows")
+    ap.add_argument("--backfill-dates", action="store_true", help="Only recompute document.published_date from stored paths")
+    ap.add_argument("--rebuild-overviews", action="store_true", help="Only rebuild document_overview (page-1 text)")
+    ap.add_argument("--split-embeddings", action="store_true", help="Only move chunk.embedding into the chunk_vec table")
+    ap.add_argument("--rebuild-centroids", action="store_true", help="Only rebuild document/page centroid embeddings from chunk_vec")
+    ap.add_argument("--seed-embed-cache", action="store_true", help="Only fill embedding_cache from existing chunk_vec rows")
+    ap.add_argument("--backfill-embeddings", action="store_true", help="Only embed chunks stored without a vector")
+    ap.add_argument("--rebuild-postings", action="store_true", help="Only rebuild the token postings index (term_posting / term_doc)")
+    ap.add_argument("--force", action="store_true", help="Re-ingest every file even if the manifest says it is unchanged")
+    ap.add_argument("--prune-duplicates", action="store_true", help="Only delete documents ingested more than once from the same path")
+    ap.add_argument("--import-trees", action="store_true", help="Only load existing _tree.json files into document_tree_section")
+    ap.add_argument("--gc-media", action="store_true", help="Only delete stored media no document references")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("INGEST_WORKERS", "1")), help="Parse DOCX in N processes (single DB writer)")
+    ap.add_argument("--resume", action="store_true", help="Continue the last unfinished run (its root/out; failed files and missing vectors retried)")
+    ap.add_argument("--serial", action="store_true", help="Parse, embed and write one file at a time (no pipeline)")
+    ap.add_argument("--compress", action="store_true", default=COMPRESS_TEXT, help="Store chunk text / document meta zlib-compressed")
+    ap.add_argument("--compress-existing", action="store_true", help="Only compress chunk text / document meta already in the DB")
+    ap.add_argument("--decompress-existing", action="store_true", help="Only restore chunk text / document meta to plain TEXT")
     args = ap.parse_args()
 
     out_root = Path(args.out)
@@ -543,19 +2089,66 @@ def main():
         if args.rebuild_fts:
             rebuild_chunk_fts_from_existing(conn)
             return
-        files = discover_files(args.root, args.glob)
-        if not files:
-            print("[ingest] No DOCX files found.")
+        if args.backfill_dates:
+            backfill_published_dates(conn, only_missing=False)
             return
-        for f in files:
-            try:
-                ingest_one_docx(conn, f, out_root)
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                print(f"[ingest] ERROR {f}: {e}")
+        if args.rebuild_overviews:
+            rebuild_document_overviews(conn)
+            return
+        if args.split_embeddings:
+            migrate_embeddings_to_chunk_vec(conn)
+            return
+        if args.rebuild_centroids:
+            rebuild_centroids(conn)
+            return
+        if args.seed_embed_cache:
+            seed_embedding_cache(conn)
+            return
+        if args.backfill_embeddings:
+            backfill_missing_embeddings(conn)
+            print(f"[embed] {embed_cache_summary()}")
+            return
+        if args.rebuild_postings:
+            rebuild_term_postings(conn)
+            return
+        if args.prune_duplicates:
+            prune_duplicate_documents(conn)
+            return
+        if args.import_trees:
+            import_tree_json_files(conn)
+            return
+        if args.gc_media:
+            gc_media(conn, out_root)
+            return
+        if args.compress_existing or args.decompress_existing:
+            database_manager.reencode_stored_text(conn, compress=args.compress_existing)
+            conn.execute("VACUUM")
+            return
+        run_id = None
+        if args.resume:
+            run = last_unfinished_run(conn)
+            if run is None:
+                print("[ingest] --resume: no unfinished run.")
+                return
+            run_id, out_root = run["run_id"], Path(run["out_dir"])
+            left = [r[0] for r in conn.execute(
+                "SELECT path FROM ingest_run_file WHERE run_id=? AND status <> 'done' ORDER BY path", (run_id,))]
+            files = [f for f in left if os.path.isfile(f)]
+            for f in left:
+                if f not in files:
+                    checkpoint_file(conn, run_id, f, "error", error="file no longer exists")
+            conn.commit()
+            print(f"[ingest] resuming run {run_id}: {len(files)} files left")
+        else:
+            files = discover_files(args.root, args.glob)
+            if not files:
+                print("[ingest] No DOCX files found.")
+                return
+        ingest_files(conn, files, out_root, root=args.root, pattern=args.glob, workers=args.workers,
+                     compress=args.compress, force=args.force, serial=args.serial, run_id=run_id)
     finally:
         conn.close()
+    print(f"[embed] {embed_cache_summary()}")
     print("[ingest] done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Watch-folder ingestion: keeps the DB in step with the DOCX root without
+anyone running ingest_dir.py by hand.
+
+Every --interval seconds the root is scanned (stdlib polling, works on
+network/OneDrive folders where change notifications are unreliable). A
+file is ingested once its size and mtime have not changed for --debounce
+seconds, so half-copied or still-syncing files are left alone. Ready files
+that differ from ingest_manifest go through ingest_dir.ingest_files: the
+same checkpointed parse -> embed -> write pipeline, which also updates
+chunk_fts, postings and company_term_count for each document and bumps the
+corpus generation in the same commit. The API opens a fresh connection per
+request (WAL), so new reports are visible as soon as each file commits.
+
+Usage:
+  python watch_ingest.py --root "Docx Retail copy" --db pdfint.db
+  python watch_ingest.py --once          # one scan + ingest, e.g. from a scheduler
+"""
+
+import os, sys, time, signal, argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ingest_dir
+import database_manager
+
+_STOP = {"flag": False}
+
+
+def _request_stop(signum, frame):
+    print(f"[watch] signal {signum}: stopping after the current cycle")
+    _STOP["flag"] = True
+
+def ingested_signatures(conn) -> Dict[str, Tuple[int, float]]:
+    """(size, mtime) the manifest holds for every file that has a document."""
+    return {r["path"]: (r["size"], r["mtime"])
+            for r in conn.execute("SELECT path, size, mtime FROM ingest_manifest WHERE document_id IS NOT NULL")}
+
+def ready_files(root: str, pattern: str, pending: Dict[str, Tuple[Tuple[int, float], float]],
+                handled: Dict[str, Tuple[int, float]], debounce: float, now: float) -> List[str]:
+    """
+    New/changed files whose (size, mtime) has been stable for `debounce` seconds.
+    pending: path -> (signature, first time seen with it); updated in place.
+    """
+    current: Dict[str, Tuple[int, float]] = {}
+    for f in ingest_dir.discover_files(root, pattern):
+        try:
+            st = os.stat(f)
+        except OSError:
+            continue  # vanished between glob and stat
+        current[f] = (st.st_size, st.st_mtime)
+    for f in list(pending):
+        if f not in current:
+            del pending[f]
+    ready = []
+    for f, sig in current.items():
+        if handled.get(f) == sig:
+            continue
+        seen = pending.get(f)
+        if seen is None or seen[0] != sig:
+            pending[f] = (sig, now)  # new or still changing: restart the debounce
+        elif now - seen[1] >= debounce:
+            ready.append(f)
+    return sorted(ready)
+
+def run_cycle(conn, args, pending, handled) -> int:
+    files = ready_files(args.root, args.glob, pending, handled, args.debounce, time.time())
+    if not files:
+        return 0
+    print(f"[watch] {len(files)} new/changed files ready")
+    n = ingest_dir.ingest_files(conn, files, Path(args.out), root=args.root, pattern=args.glob,
+                                workers=args.workers, compress=args.compress)
+    # done (or failed: a file that keeps failing is retried only when it changes again)
+    for f in files:
+        handled[f] = pending.pop(f)[0]
+    handled.update(ingested_signatures(conn))
+    print(f"[watch] ingested {n} files; corpus generation {database_manager.corpus_generation(conn)}; "
+          f"{ingest_dir.embed_cache_summary()}")
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description="Watch a DOCX folder and ingest new/changed files incrementally")
+    ap.add_argument("--root", default=ingest_dir.SOURCE_ROOT, help="DOCX root (debug copies)")
+    ap.add_argument("--db", default=ingest_dir.DEFAULT_DB, help="SQLite path for main DB")
+    ap.add_argument("--glob", default="", help="Glob (e.g. '**/*.docx'); empty = all DOCX")
+    ap.add_argument("--out", default=ingest_dir.OUT_DIR, help="Output dir for media")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("INGEST_WORKERS", "1")), help="Parse DOCX in N processes")
+    ap.add_argument("--compress", action="store_true", default=ingest_dir.COMPRESS_TEXT, help="Store chunk text / document meta zlib-compressed")
+    ap.add_argument("--interval", type=float, default=10.0, help="Seconds between scans")
+    ap.add_argument("--debounce", type=float, default=20.0, help="Seconds a file must stay unchanged before it is ingested")
+    ap.add_argument("--once", action="store_true", help="Scan and ingest once (no debounce), then exit")
+    args = ap.parse_args()
+
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    conn = ingest_dir.connect(args.db)
+    try:
+        handled = ingested_signatures(conn)
+        pending: Dict[str, Tuple[Tuple[int, float], float]] = {}
+        if args.once:
+            args.debounce = 0.0
+            ready_files(args.root, args.glob, pending, handled, 0.0, time.time())  # register
+            run_cycle(conn, args, pending, handled)
+            return
+        print(f"[watch] watching {os.path.abspath(args.root)} every {args.interval:g}s "
+              f"(debounce {args.debounce:g}s); corpus generation {database_manager.corpus_generation(conn)}")
+        while not _STOP["flag"]:
+            try:
+                run_cycle(conn, args, pending, handled)
+            except Exception as err:
+                conn.rollback()
+                print(f"[watch] ERROR in cycle: {err}")
+            deadline = time.time() + args.interval
+            while not _STOP["flag"] and time.time() < deadline:
+                time.sleep(0.5)
+    finally:
+        conn.close()
+    print("[watch] stopped.")
+
+if __name__ == "__main__":
+    main()